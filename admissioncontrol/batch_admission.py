@@ -0,0 +1,92 @@
+"""
+1. Look up each distinct DAG's frontier once for the whole batch
+2. Admit the requests that need the least memory first, which fits the most requests, then the most constrained
+3. For each request, try its valid instances from lightest to heaviest on the scarcest resources
+"""
+from time import perf_counter
+
+from .dag_generation import Resource
+from .frontier_cache import FrontierCache, dag_fingerprint
+from .dag_picker import DAGSelector
+
+
+class AdmissionDecision:
+
+	def __init__(self, request, instance=None, function_place_map=None):
+		self.request = request  # (dag, price SLO, time SLO)
+		self.instance = instance
+		self.function_place_map = function_place_map
+
+	def is_admitted(self):
+		return self.instance is not None
+
+
+class BatchResult:
+
+	def __init__(self, decisions, elapsed):
+		self.decisions = decisions  # One per request, in request order
+		self.elapsed = elapsed
+
+	def num_admitted(self):
+		return sum(1 for decision in self.decisions if decision.is_admitted())
+
+	def requests_per_second(self):
+		return len(self.decisions) / self.elapsed if self.elapsed > 0 else float('inf')
+
+
+def instance_memory(instance):
+	"""Memory an instance needs on each resource type."""
+	return {res: sum(func_mem for _, func_mem in res_list) for res, res_list in instance.functions_per_resource.items()}
+
+
+def admit_batch(requests, cluster, frontier_cache=None, sample_size=1, max_attempts=8):
+	"""
+	Decide admission and placement for a batch of (dag, price SLO, time SLO) requests on `cluster`.
+	Placements are committed on the cluster's placement engine as they are made.
+	"""
+	start = perf_counter()
+	if frontier_cache is None:
+		frontier_cache = FrontierCache()
+	engine = cluster.get_placement_engine()
+
+	# Shared work: one fingerprint per DAG object, one frontier and selector per distinct DAG
+	fingerprints = {}
+	selectors = {}
+	for (dag, _, _) in requests:
+		if id(dag) not in fingerprints:
+			fingerprint = dag_fingerprint(dag)
+			fingerprints[id(dag)] = fingerprint
+			if fingerprint not in selectors:
+				selectors[fingerprint] = DAGSelector(frontier_cache.get_pareto_instances(dag), sample_size)
+
+	memories = {}
+	candidates = []
+	for (dag, price_slo, time_slo) in requests:
+		valid_list = selectors[fingerprints[id(dag)]].get_valid_list(price_slo, time_slo)
+		for instance in valid_list:
+			if id(instance) not in memories:
+				memories[id(instance)] = instance_memory(instance)
+		candidates.append(valid_list)
+
+	def min_demand(i):
+		return min((sum(memories[id(instance)].values()) for instance in candidates[i]), default=0)
+
+	order = sorted(range(len(requests)), key=lambda i: (min_demand(i), len(candidates[i])))
+	free = {res: sum(node.memory for node in cluster.nodes_by_res[res]) for res in Resource}
+	decisions = [AdmissionDecision(request) for request in requests]
+	for i in order:
+		if not candidates[i]:
+			continue
+		# Weigh each resource's memory by how little of it is left
+		weights = {res: 1.0 / max(free[res], 1) for res in Resource}
+		ranked = sorted(candidates[i], key=lambda instance: sum(weights[res] * mem for res, mem in memories[id(instance)].items()))
+		for instance in ranked[:max_attempts]:
+			function_place_map = engine.place(instance)
+			if function_place_map:
+				decisions[i].instance = instance
+				decisions[i].function_place_map = function_place_map
+				for res, mem in memories[id(instance)].items():
+					free[res] -= mem
+				break
+
+	return BatchResult(decisions, perf_counter() - start)
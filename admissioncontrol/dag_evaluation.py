@@ -0,0 +1,91 @@
+"""
+1. Represent many candidate resource assignments of a DAG as one integer matrix (candidates x functions)
+2. Walk the dependency queue once, computing every candidate's finish times a column at a time
+3. Running time is the latest finish, running cost is the sum of the chosen resources' prices
+"""
+import numpy as np
+
+from .dag_generation import Resource, build_dag_instance, pareto_mask
+
+
+class DAGEvaluator:
+
+	def __init__(self, dag):
+		self.dag = dag
+		self.dep_queue = dag.gen_dep_queue()
+		self.resources = list(Resource)
+		index = {function.id: i for i, function in enumerate(self.dep_queue)}
+		# runtimes[i, r] is the runtime of dep_queue[i] on resources[r]
+		self.runtimes = np.array([[function.get_resource_runtime(res) for res in self.resources] for function in self.dep_queue])
+		self.prices = np.array([res.value[0] for res in self.resources])
+		self.preds = [[] for _ in self.dep_queue]
+		for i, function in enumerate(self.dep_queue):
+			for next_func in function.next_funcs:
+				self.preds[index[next_func.id]].append(i)
+
+	def num_functions(self):
+		return len(self.dep_queue)
+
+	def evaluate(self, assignments):
+		"""
+		Running time and cost of every row of `assignments`, where assignments[k, i] is the index in
+		list(Resource) that candidate k runs dep_queue[i] on. Returns two arrays with one entry per candidate.
+		"""
+		assignments = np.asarray(assignments)
+		(num_candidates, num_functions) = assignments.shape
+		assert num_functions == len(self.dep_queue), "Each candidate needs a resource for every function."
+		runtimes = self.runtimes[np.arange(num_functions), assignments]
+		finish = np.zeros((num_candidates, num_functions), dtype=runtimes.dtype)
+		for i, preds in enumerate(self.preds):
+			if len(preds) == 0:
+				finish[:, i] = runtimes[:, i]
+			elif len(preds) == 1:
+				finish[:, i] = finish[:, preds[0]] + runtimes[:, i]
+			else:
+				finish[:, i] = finish[:, preds].max(axis=1) + runtimes[:, i]
+		running_times = finish.max(axis=1) if num_functions > 0 else np.zeros(num_candidates, dtype=runtimes.dtype)
+		running_costs = self.prices[assignments].sum(axis=1)
+		return (running_times, running_costs)
+
+	def iter_all_assignments(self, block_size=1 << 16, prefix=()):
+		"""
+		Every assignment, in the order gen_dag_instances produces them, as blocks of at most `block_size` rows.
+		With a prefix, only the assignments that start with those resource indices.
+		"""
+		num_resources = len(self.resources)
+		num_free = len(self.dep_queue) - len(prefix)
+		assert num_free >= 0, "The prefix can't be longer than the DAG."
+		total = num_resources ** num_free
+		# The last function varies fastest, so a candidate's digits in base len(Resource) are its assignment
+		place_values = num_resources ** np.arange(num_free - 1, -1, -1, dtype=np.int64)
+		prefix = np.asarray(prefix, dtype=np.int64)
+		for start in range(0, total, block_size):
+			numbers = np.arange(start, min(start + block_size, total), dtype=np.int64)
+			free = (numbers[:, None] // place_values[None, :]) % num_resources
+			yield np.hstack([np.broadcast_to(prefix, (len(numbers), len(prefix))), free])
+
+	def select_pareto_assignments(self, assignment_blocks):
+		"""
+		The rows select_pareto_instances would keep, across a stream of assignment blocks, in stream order.
+		Each block is cut down to the rows on its own frontier (ties included) before they are merged.
+		"""
+		survivors = []
+		survivor_times = []
+		survivor_costs = []
+		for block in assignment_blocks:
+			block = np.asarray(block)
+			(running_times, running_costs) = self.evaluate(block)
+			keep = pareto_mask(running_times, running_costs, keep_ties=True)
+			survivors.append(block[keep])
+			survivor_times.append(running_times[keep])
+			survivor_costs.append(running_costs[keep])
+		if not survivors:
+			return np.zeros((0, len(self.dep_queue)), dtype=np.int64)
+		survivors = np.concatenate(survivors)
+		keep = pareto_mask(np.concatenate(survivor_times), np.concatenate(survivor_costs))
+		return survivors[keep]
+
+	def gen_pareto_instances(self, block_size=1 << 16):
+		"""Same as select_pareto_instances(gen_dag_instances(dag)), evaluated a block of candidates at a time."""
+		pareto_assignments = self.select_pareto_assignments(self.iter_all_assignments(block_size))
+		return [build_dag_instance(self.dag, self.dep_queue, [self.resources[r] for r in row]) for row in pareto_assignments]
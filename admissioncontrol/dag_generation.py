@@ -3,7 +3,18 @@
 2. Iterate through array, at each step trying each configuration, updating the set of resources as you go
 3. Recursively call the function at each valid config,
 """
+import warnings
+from bisect import bisect_left, bisect_right
 from enum import Enum
+from operator import le
+
+try:
+	import numpy as np
+except ImportError:
+	np = None
+
+NUMPY_PARETO_THRESHOLD = 10000  # Lists at least this long use the NumPy sweep
+MAX_PARETO_LABELS = 500  # Partial assignments gen_pareto_instances keeps at each step before it approximates
 
 
 class Resource(Enum):
@@ -42,7 +53,8 @@ class DAG:
 		gen_queue.append(self.root)
 		while len(dependency_queue) < self.num_funcs:
 			temp_func = gen_queue.pop(0)
-			for next_function in temp_func.next_funcs:
+			# next_funcs is a set ordered by object id, sorting keeps the queue the same in every process
+			for next_function in sorted(temp_func.next_funcs, key=lambda f: f.id):
 				next_eval = 1
 				if next_function.id in incomplete_map:
 					next_eval += incomplete_map[next_function.id]
@@ -74,14 +86,14 @@ class DAGInstance:
 
 	def copy_dag_instance(self):
 		new_dag_instance = DAGInstance(self.dag)
-		for id_one, res in self.id_res_map:
+		for id_one, res in self.id_res_map.items():
 			new_dag_instance.id_res_map[id_one] = res
-		for id_two, max_prev in self.id_max_map:
+		for id_two, max_prev in self.id_max_map.items():
 			new_dag_instance.id_max_map[id_two] = max_prev
-		for i in range(len(self.functions_per_resource)):
-			for func_tuple in self.functions_per_resource[i]:
+		for res, func_tuples in self.functions_per_resource.items():
+			for func_tuple in func_tuples:
 				new_tuple = (func_tuple[0], func_tuple[1])
-				new_dag_instance.functions_per_resource[i].append(new_tuple)
+				new_dag_instance.functions_per_resource[res].append(new_tuple)
 		new_dag_instance.running_cost = self.running_cost
 		new_dag_instance.running_time = self.running_time
 		return new_dag_instance
@@ -133,16 +145,399 @@ def gen_dag_instances(dag):
 
 
 def select_pareto_instances(instance_list):
-	pareto_list = []
-
-	for instance in instance_list:
-		pareto_add = True
-		for comp_instance in instance_list:
-			if not (instance is comp_instance):
-				if (comp_instance.running_time <= instance.running_time) and (comp_instance.running_cost <= instance.running_cost):
-					pareto_add = False
-					break
-		if pareto_add:
-			pareto_list.append(instance)
-
-	return pareto_list
+	"""
+	Keep the instances that no other instance matches or beats in both running time and cost, in input order.
+	Two different instances with the same time and cost both get dropped.
+	Sorts by (time, cost) and sweeps once, using NumPy for large lists when it is available.
+	"""
+	if np is not None and len(instance_list) >= NUMPY_PARETO_THRESHOLD:
+		return _select_pareto_instances_numpy(instance_list)
+
+	order = sorted(range(len(instance_list)), key=lambda k: (instance_list[k].running_time, instance_list[k].running_cost))
+	kept = []
+	best_cost = None  # Cheapest cost among strictly faster instances
+	k = 0
+	while k < len(order):
+		first = instance_list[order[k]]
+		group_end = k
+		while group_end < len(order) and instance_list[order[group_end]].running_time == first.running_time:
+			group_end += 1
+		run_end = k
+		while run_end < group_end and instance_list[order[run_end]].running_cost == first.running_cost:
+			run_end += 1
+		# Only the cheapest of the fastest can survive, and only if it is a single instance (maybe listed twice)
+		if (best_cost is None or first.running_cost < best_cost) and \
+				all(instance_list[x] is first for x in order[k:run_end]):
+			kept.extend(order[k:run_end])
+		if best_cost is None or first.running_cost < best_cost:
+			best_cost = first.running_cost
+		k = group_end
+
+	return [instance_list[x] for x in sorted(kept)]
+
+
+def _select_pareto_instances_numpy(instance_list):
+	times = np.array([instance.running_time for instance in instance_list])
+	costs = np.array([instance.running_cost for instance in instance_list])
+	ids = np.array([id(instance) for instance in instance_list], dtype=np.uint64)
+	return [instance_list[x] for x in np.flatnonzero(pareto_mask(times, costs, ids))]
+
+
+def pareto_mask(times, costs, ids=None, keep_ties=False):
+	"""
+	NumPy version of select_pareto_instances over arrays: which entries no other entry matches or beats.
+	`ids` tells apart entries that are the same instance (default: all different). With `keep_ties`, entries
+	tied with a different entry are kept too, which is what's needed before merging with other batches.
+	"""
+	n = len(times)
+	if ids is None:
+		ids = np.arange(n)
+	order = np.lexsort((costs, times))
+	times, costs, ids = times[order], costs[order], ids[order]
+
+	# Start of each position's time group, and of its run of equal (time, cost)
+	positions = np.arange(n)
+	new_group = np.ones(n, dtype=bool)
+	new_group[1:] = times[1:] != times[:-1]
+	group_start = np.maximum.accumulate(np.where(new_group, positions, 0))
+	new_run = new_group.copy()
+	new_run[1:] |= costs[1:] != costs[:-1]
+	run_start = np.maximum.accumulate(np.where(new_run, positions, 0))
+
+	# Cheapest cost among strictly faster entries
+	cheapest = np.minimum.accumulate(costs)
+	faster_cheapest = np.where(group_start > 0, cheapest[np.maximum(group_start - 1, 0)], np.inf)
+	kept = (run_start == group_start) & (costs < faster_cheapest)
+
+	if not keep_ties:
+		# A run is tied if it holds more than one distinct entry
+		differs = np.zeros(n, dtype=bool)
+		differs[1:] = (ids[1:] != ids[:-1]) & ~new_run[1:]
+		tied = np.zeros(n, dtype=bool)
+		tied[run_start[differs]] = True
+		kept &= ~tied[run_start]
+
+	mask = np.zeros(n, dtype=bool)
+	mask[order[kept]] = True
+	return mask
+
+
+class ParetoFrontier:
+	"""
+	The result of select_pareto_instances, kept up to date as instances are added one at a time.
+	Holds one entry per (time, cost) point that nothing dominates, so dominated instances are dropped as they arrive.
+	"""
+
+	def __init__(self, instance_list=()):
+		self.times = []    # Increasing
+		self.costs = []    # Strictly decreasing
+		self.entries = []  # (arrival number, instance) reaching each point
+		self.num_added = 0
+		for instance in instance_list:
+			self.add(instance)
+
+	def __len__(self):
+		return len(self.times)
+
+	def add(self, instance):
+		running_time = instance.running_time
+		running_cost = instance.running_cost
+		entry = (self.num_added, instance)
+		self.num_added += 1
+		# The last point at least as fast is also the cheapest point at least as fast
+		i = bisect_right(self.times, running_time) - 1
+		if i >= 0 and self.costs[i] <= running_cost:
+			if self.times[i] == running_time and self.costs[i] == running_cost:
+				self.entries[i].append(entry)
+			return
+		# Evict the points the new one dominates; they directly follow it
+		start = bisect_left(self.times, running_time)
+		end = start
+		while end < len(self.costs) and self.costs[end] >= running_cost:
+			end += 1
+		self.times[start:end] = [running_time]
+		self.costs[start:end] = [running_cost]
+		self.entries[start:end] = [[entry]]
+
+	def extend(self, instance_list):
+		for instance in instance_list:
+			self.add(instance)
+
+	def get_pareto_instances(self, keep_ties=False):
+		"""
+		Same as select_pareto_instances over every instance added so far.
+		With `keep_ties`, different instances at the same point are all kept, e.g. to merge with other frontiers later.
+		"""
+		kept = []
+		for entries in self.entries:
+			if keep_ties or all(instance is entries[0][1] for _, instance in entries):
+				kept.extend(entries)
+		kept.sort(key=lambda entry: entry[0])
+		return [instance for _, instance in kept]
+
+
+def build_dag_instance(dag, dep_queue, assignment):
+	"""Build the DAGInstance that assigns dep_queue[i] to assignment[i], the same way gen_dag_instances does."""
+	root = dep_queue[0]
+	root_res = assignment[0]
+	dag_instance = DAGInstance(dag)
+	dag_instance.id_res_map[root.id] = root_res
+	for root_next_func in root.next_funcs:
+		dag_instance.id_max_map[root_next_func.id] = root.get_resource_runtime(root_res)
+	dag_instance.running_time = root.get_resource_runtime(root_res)
+	dag_instance.running_cost = root_res.value[0]
+	dag_instance.add_func_res(root, root_res)
+	for function, res in zip(dep_queue[1:], assignment[1:]):
+		dag_instance.update_dag_instance(function, res)
+	return dag_instance
+
+
+def _gen_layers(dep_queue):
+	"""
+	For each function in dep_queue, describe how a partial assignment changes once it is assigned.
+	A partial assignment is a tuple (cost, running_time, *pending), where pending holds the latest finish time
+	of the assigned predecessors of each open function (an unassigned function with an assigned predecessor).
+	Returns (position of the function in the previous pending, [(previous position or None, is successor)], open ids).
+	"""
+	layers = []
+	assigned = set()
+	open_ids = []
+	for function in dep_queue:
+		assigned.add(function.id)
+		position = open_ids.index(function.id) if function.id in open_ids else None
+		next_ids = {f.id for f in function.next_funcs}
+		new_open_ids = sorted((set(open_ids) | next_ids) - assigned)
+		sources = [(open_ids.index(fid) if fid in open_ids else None, fid in next_ids) for fid in new_open_ids]
+		layers.append((position, sources, new_open_ids))
+		open_ids = new_open_ids
+	return layers
+
+
+def _expand_label(label, layer, function, res):
+	"""Assign `function` to `res` in a partial assignment built by _gen_layers."""
+	position, sources, _ = layer
+	func_time = (label[2 + position] if position is not None else 0) + function.get_resource_runtime(res)
+	new_label = [label[0] + res.value[0], max(label[1], func_time)]
+	for source, is_next in sources:
+		value = label[2 + source] if source is not None else 0
+		if is_next and value < func_time:
+			value = func_time
+		new_label.append(value)
+	return tuple(new_label)
+
+
+def _check_dominance(label, twice, kept):
+	"""
+	Whether a partial assignment is still needed next to the `kept` (label, twice) ones: None if it isn't,
+	otherwise whether more than one assignment reaches whatever frontier point it ends on.
+	A kept label that is at least as cheap and fast whatever comes next makes it redundant if it is strictly
+	cheaper (it can't end on the frontier) or reached twice itself. One at the same cost reaches every frontier
+	point this one does, so this one is kept, but as reached twice.
+	"""
+	cost = label[0]
+	running_time = label[1]
+	for other, other_twice in kept:
+		if other[1] <= running_time and all(map(le, other, label)):
+			if other[0] < cost or other_twice:
+				return None
+			twice = True
+	return twice
+
+
+def search_order(dep_queue):
+	"""
+	The functions of dep_queue in a dependency order that keeps few functions open at once, since every open
+	function is another entry in each partial assignment. Each step takes the ready function that opens the fewest
+	new ones, the earliest in dep_queue on ties.
+	"""
+	position = {function.id: i for i, function in enumerate(dep_queue)}
+	waiting = {function.id: len(function.prev_funcs) for function in dep_queue}
+	open_ids = set()
+	ready = [dep_queue[0]]
+	order = []
+	while ready:
+		function = min(ready, key=lambda f: (sum(1 for g in f.next_funcs if g.id not in open_ids), position[f.id]))
+		ready.remove(function)
+		order.append(function)
+		open_ids.discard(function.id)
+		for next_func in function.next_funcs:
+			open_ids.add(next_func.id)
+			waiting[next_func.id] -= 1
+			if waiting[next_func.id] == 0:
+				ready.append(next_func)
+	return order
+
+
+class _Completion:
+	"""Finishing a partial assignment by running every remaining function on a fixed choice of resource."""
+
+	def __init__(self, dep_queue, layers, choice):
+		self.choice = choice
+		tail = {}
+		for function, res in reversed(list(zip(dep_queue, choice))):
+			tail[function.id] = function.get_resource_runtime(res) + max((tail[f.id] for f in function.next_funcs), default=0)
+		self.tails = [[tail[fid] for fid in open_ids] for (_, _, open_ids) in layers]
+		self.cost_after = [sum(res.value[0] for res in choice[i + 1:]) for i in range(len(choice))]
+
+	def point(self, label, i):
+		"""(cost, running time) of completing a partial assignment of dep_queue[:i + 1]."""
+		running_time = max([label[1]] + [value + tail for value, tail in zip(label[2:], self.tails[i])])
+		return (label[0] + self.cost_after[i], running_time)
+
+
+class _Staircase:
+	"""A 2-D (cost, time) Pareto frontier, kept sorted by cost with strictly falling times."""
+
+	def __init__(self):
+		self.costs = []
+		self.times = []
+
+	def strictly_covers(self, cost, time):
+		"""Whether some point other than (cost, time) itself is at least as cheap and fast as it."""
+		i = bisect_right(self.costs, cost) - 1
+		return i >= 0 and (self.times[i] < time or (self.times[i] == time and self.costs[i] < cost))
+
+	def add(self, cost, time):
+		i = bisect_right(self.costs, cost) - 1
+		if i >= 0 and self.times[i] <= time:
+			return
+		i = bisect_left(self.costs, cost)
+		j = i
+		while j < len(self.costs) and self.times[j] >= time:
+			j += 1
+		self.costs[i:j] = [cost]
+		self.times[i:j] = [time]
+
+
+def _trim_labels(labels, time_bounds, max_labels):
+	"""The max_labels labels with the lowest time bounds at each cost, taking as many at every cost."""
+	by_cost = {}
+	for entry, time_bound in zip(labels, time_bounds):
+		by_cost.setdefault(entry[0][0], []).append((time_bound, entry))
+	ranked = []
+	for entries in by_cost.values():
+		entries.sort(key=lambda e: e[0])
+		ranked.extend((rank, time_bound, entry) for rank, (time_bound, entry) in enumerate(entries))
+	ranked.sort(key=lambda r: (r[0], r[1]))
+	return [entry for _, _, entry in ranked[:max_labels]]
+
+
+class ParetoSearch:
+	"""
+	The label search behind gen_pareto_instances, over the assignments of `order`, a dependency order of a DAG's
+	functions. Works over `order` one function at a time like gen_dag_instances, but drops partial assignments
+	that another one dominates, or whose lower bound a known complete assignment beats. Each partial assignment
+	also records whether more than one assignment can reach the frontier points it ends on, because
+	select_pareto_instances drops those points.
+	known_points are the (cost, running time) of complete assignments found elsewhere, which prune like those the
+	search finds itself. A search can start from the `labels` another search had after `step` functions, to go on
+	with only some of them. If more than max_labels partial assignments are left after a step, only that many are
+	kept, those with the lowest time bound at each cost, and `truncated` is set.
+	"""
+
+	def __init__(self, order, max_labels=None, known_points=(), step=0, labels=None):
+		self.order = order
+		self.max_labels = max_labels
+		self.layers = _gen_layers(order)
+		resources = list(Resource)
+		# Completing on the fastest resources gives a lower bound on time, and on the cheapest a lower bound on cost
+		self.fastest = _Completion(order, self.layers,
+			[min(resources, key=lambda res: (f.get_resource_runtime(res), res.value[0])) for f in order])
+		self.cheapest = _Completion(order, self.layers,
+			[min(resources, key=lambda res: (res.value[0], f.get_resource_runtime(res))) for f in order])
+		# Both completions of every partial assignment are real assignments, so they are recorded as they are found
+		self.known = _Staircase()
+		for point in known_points:
+			self.known.add(*point)
+		self.truncated = False
+		self.step = step  # Functions of `order` assigned so far
+		# (partial assignment, resources so far, whether reached twice)
+		self.labels = [((0, 0), (), False)] if labels is None else labels
+
+	def done(self):
+		return self.step == len(self.order)
+
+	def known_points(self):
+		return list(zip(self.known.costs, self.known.times))
+
+	def advance(self):
+		"""Assign the next function of `order`."""
+		i = self.step
+		(function, layer) = (self.order[i], self.layers[i])
+		(fastest, cheapest, known) = (self.fastest, self.cheapest, self.known)
+		expanded = {}
+		for label, assignment, twice in self.labels:
+			for res in Resource:
+				new_label = _expand_label(label, layer, function, res)
+				entry = expanded.get(new_label)
+				if entry is None:
+					expanded[new_label] = [assignment + (res,), twice]
+				else:
+					entry[1] = True
+		for label in expanded:
+			known.add(*fastest.point(label, i))
+			known.add(*cheapest.point(label, i))
+		labels = []
+		kept = []
+		time_bounds = []
+		for label in sorted(expanded):
+			time_bound = fastest.point(label, i)[1]
+			if known.strictly_covers(cheapest.point(label, i)[0], time_bound):
+				continue
+			(assignment, twice) = expanded[label]
+			twice = _check_dominance(label, twice, kept)
+			if twice is None:
+				continue
+			kept.append((label, twice))
+			labels.append((label, assignment, twice))
+			time_bounds.append(time_bound)
+		if self.max_labels is not None and len(labels) > self.max_labels:
+			labels = _trim_labels(labels, time_bounds, self.max_labels)
+			self.truncated = True
+		self.labels = labels
+		self.step += 1
+
+	def run(self):
+		"""
+		Search to the end. Returns [(cost, running time, assignment, twice)] for the points that neither a searched
+		assignment nor a known point beats, by cost.
+		"""
+		while not self.done():
+			self.advance()
+		# Every partial assignment is now complete, (cost, running time), and in order
+		points = []
+		for label, assignment, twice in sorted(self.labels, key=lambda entry: entry[0]):
+			if not points or label[1] < points[-1][1]:
+				points.append((label[0], label[1], assignment, twice))
+		return points
+
+
+def gen_pareto_instances(dag, max_labels=MAX_PARETO_LABELS):
+	"""
+	Build select_pareto_instances(gen_dag_instances(dag)) without enumerating every assignment, see ParetoSearch.
+	Limit: a partial assignment holds an entry per open function (one with an assigned predecessor but not yet
+	assigned itself), and dominance rarely prunes once there are many. Pipelines of 100 functions take about
+	0.3s, but the number of partial assignments grows exponentially with the number of open functions, which is
+	25 to 40 for 100 functions that each depend on any earlier ones. So if more than max_labels partial
+	assignments are left at any step, only that many are kept, those with the lowest time bound at each cost,
+	and a RuntimeWarning is raised; such 100-function DAGs then take a few seconds. The instances returned are
+	still real assignments that none of the others beat, but frontier points can be missing, or kept although a
+	dropped assignment also reaches them. Pass max_labels=None to always search exactly.
+	"""
+	dep_queue = dag.gen_dep_queue()
+	order = search_order(dep_queue)
+	search = ParetoSearch(order, max_labels)
+	points = search.run()
+	if search.truncated:
+		warnings.warn(f"The Pareto frontier of DAG {dag.id} is approximate: more than {max_labels} partial "
+			"assignments were left at some step.", RuntimeWarning)
+	return build_pareto_instances(dag, dep_queue, order, [point[2] for point in points if not point[3]])
+
+
+def build_pareto_instances(dag, dep_queue, order, assignments):
+	"""Instances of assignments over `order`, in the order gen_dag_instances generates them."""
+	resources = list(Resource)
+	position = {function.id: i for i, function in enumerate(order)}
+	assignments = [[assignment[position[function.id]] for function in dep_queue] for assignment in assignments]
+	assignments.sort(key=lambda assignment: [resources.index(res) for res in assignment])
+	return [build_dag_instance(dag, dep_queue, assignment) for assignment in assignments]
@@ -7,7 +7,8 @@ from enum import Enum
 from .dag_generation import *
 from math import ceil, floor
 from random import randint, sample
-from bisect import bisect
+from bisect import bisect, bisect_left
+from .placement import PlacementEngine
 
 
 class Node:
@@ -27,64 +28,107 @@ class Cluster:
 			self.nodes_by_res[res] = []
 		for node in nodes:
 			self.nodes_by_res[node.resource_type].append(node)
+		self.placement_engine = None
+
+	def get_placement_engine(self):
+		if self.placement_engine is None:
+			self.placement_engine = PlacementEngine(self)
+		return self.placement_engine
 
 
 class DAGSelector:
 
 	def __init__(self, instance_list, sample_size):
-		self.price_list = sorted(instance_list, key=lambda x: x.running_cost)
-		self.time_list = sorted(instance_list, key=lambda x: x.running_time)
+		self.price_list = sorted(instance_list, key=lambda x: (x.running_cost, x.running_time))
 		self.sample_size = int(max(min(sample_size, len(self.price_list)), 1))
-
-	def binary_find_index(self, value, this_list):
-		pos = (bisect(this_list, value, 0, len(this_list))) - 1
-		return pos
-
-	def get_sample_list(self, price_slo, time_slo):
-		sample_list = []
-		price_index = self.binary_find_index(price_slo, self.price_list)
-		time_index = self.binary_find_index(time_slo, self.time_list)
-		if (price_index < 0) or (time_index < 0):
+		self.prices = [x.running_cost for x in self.price_list]
+		times = [x.running_time for x in self.price_list]
+		# On a Pareto frontier time strictly falls as price rises, so every SLO query is one contiguous range
+		self.is_staircase = all(earlier > later for earlier, later in zip(times, times[1:]))
+		if self.is_staircase:
+			self.neg_times = [-t for t in times]
+		else:
+			self.__build_range_tree(times)
+
+	def __build_range_tree(self, times):
+		"""A merge sort tree over price order: each node holds its (time, position) pairs sorted by time."""
+		self.tree_size = 1
+		while self.tree_size < len(times):
+			self.tree_size *= 2
+		self.tree_times = [[] for _ in range(2 * self.tree_size)]
+		self.tree_positions = [[] for _ in range(2 * self.tree_size)]
+		for pos, t in enumerate(times):
+			self.tree_times[self.tree_size + pos] = [t]
+			self.tree_positions[self.tree_size + pos] = [pos]
+		for node in range(self.tree_size - 1, 0, -1):
+			merged = sorted(zip(self.tree_times[2 * node] + self.tree_times[2 * node + 1],
+				self.tree_positions[2 * node] + self.tree_positions[2 * node + 1]))
+			self.tree_times[node] = [t for t, _ in merged]
+			self.tree_positions[node] = [pos for _, pos in merged]
+
+	def binary_find_index(self, value, keys):
+		"""Index of the last key that is at most `value`, or -1 if there is none."""
+		return bisect(keys, value, 0, len(keys)) - 1
+
+	def __matching_ranges(self, price_slo, time_slo):
+		"""The instances within both SLOs, as (list, start, end) slices of price_list or range tree nodes."""
+		price_end = self.binary_find_index(price_slo, self.prices) + 1
+		if price_end <= 0:
 			return []
+		if self.is_staircase:
+			time_start = bisect_left(self.neg_times, -time_slo)
+			return [(self.price_list, time_start, price_end)] if time_start < price_end else []
+		# Split [0, price_end) into O(log n) tree nodes; within each, the matches are a prefix sorted by time
+		ranges = []
+		lo = self.tree_size
+		hi = self.tree_size + price_end
+		while lo < hi:
+			if lo & 1:
+				ranges.append(lo)
+				lo += 1
+			if hi & 1:
+				hi -= 1
+				ranges.append(hi)
+			lo //= 2
+			hi //= 2
+		matching = []
+		for node in ranges:
+			count = bisect(self.tree_times[node], time_slo)
+			if count > 0:
+				matching.append((self.tree_positions[node], 0, count))
+		return matching
+
+	def get_valid_list(self, price_slo, time_slo):
+		"""Every instance with cost at most price_slo and running time at most time_slo."""
+		valid_list = []
+		for (items, start, end) in self.__matching_ranges(price_slo, time_slo):
+			if items is self.price_list:
+				valid_list.extend(items[start:end])
+			else:
+				valid_list.extend(self.price_list[pos] for pos in items[start:end])
+		return valid_list
 
-		end_index = len(self.price_list) - time_index
-		valid_size = price_index - end_index
+	def get_sample_list(self, price_slo, time_slo):
+		"""A uniform random sample of up to sample_size instances within both SLOs, without listing them all."""
+		ranges = self.__matching_ranges(price_slo, time_slo)
+		offsets = [0]
+		for (_, start, end) in ranges:
+			offsets.append(offsets[-1] + end - start)
+		valid_size = offsets[-1]
 		if valid_size <= 0:
 			return []
 
-		valid_list = self.price_list[end_index, price_index]
-		min_size = min(self.sample_size, len(valid_list))
-		sample_list = sample(valid_list, min_size)
+		min_size = min(self.sample_size, valid_size)
+		sample_list = []
+		for rank in sample(range(valid_size), min_size):
+			k = bisect(offsets, rank) - 1
+			(items, start, _) = ranges[k]
+			item = items[start + rank - offsets[k]]
+			sample_list.append(item if items is self.price_list else self.price_list[item])
 		return sample_list
 
 	def get_placements(self, cluster, sample_instance):
-		function_place_map = {}
-		for res, res_list in list(sample_instance.functions_per_resource.items()):
-			res_nodes = cluster.nodes_by_res[res]
-			updated_nodes = []
-			for func_id, func_mem in res_list:
-				placed = False
-				done = False
-				while (not placed) and (not done):
-					if len(res_nodes) == 0:
-						done = True
-					elif func_mem <= res_nodes[0].memory:
-						function_place_map[func_id] = res_nodes[0].id
-						res_nodes[0].memory = res_nodes[0].memory - func_mem
-						placed = True
-					else:
-						popped_node = res_nodes.pop(0)
-						updated_nodes.append(popped_node)
-				if done:
-					break
-			if len(res_nodes) == 0:
-				cluster.nodes_by_res[res] = sorted(updated_nodes, key=lambda x: x.memory)
-				return {}
-			else:
-				res_nodes.extend(updated_nodes)
-				cluster.nodes_by_res[res] = sorted(res_nodes, key=lambda x: x.memory)
-
-		return function_place_map
+		return cluster.get_placement_engine().place(sample_instance)
 
 
 
@@ -3,6 +3,7 @@
 2. Iterate through array, at each step trying each configuration, updating the set of resources as you go
 3. Recursively call the function at each valid config,
 """
+from collections import deque
 from enum import Enum
 
 
@@ -125,25 +126,73 @@ class DAGInstance:
 		return temp_dag_instance
 
 
-def generate_valid_dags(cluster, dag):
-	dag_valid_list = []
-	dag_ready_queue = []
-
-	root_dag_instance = DAGInstance(dag)
-	root_func_instance = FunctionInstance(dag.root)
-	root_dag_instance.ready_queue.append(root_func_instance)
-	dag_ready_queue.append(root_dag_instance)
-
-	while len(dag_ready_queue) > 0:
-		this_dag_instance = dag_ready_queue.pop(0)
-		this_func_instance = this_dag_instance.ready_queue.pop(0)
-		for resource in Resource:
-			temp_func_instance = FunctionInstance(this_func_instance.function, node=resource, num_prev_instances=this_func_instance.num_prev_instances)
-			temp_func_time = temp_func_instance.function.get_resource_runtime(resource)
-			temp_func_instance.time = this_func_instance.max_prev_time + temp_func_time
-			new_dag_instance = this_dag_instance.copy_dag_instance(temp_func_instance.time, temp_func_time, resource)
-			new_dag_instance.gen_next_func_instance(temp_func_instance)
-			if len(new_dag_instance.ready_queue) == 0:
-				dag_valid_list.append(new_dag_instance)
+def generate_valid_dags(cluster, dag, prefix=()):
+	"""
+	Yield every DAGInstance that runs the whole DAG within dag.max_time and dag.max_cost.
+	Walks the choices depth first on a single shared state, undoing each choice on the way back up instead of
+	copying the state for every branch, so memory only grows with the size of the DAG. Running time and cost
+	only grow as functions are added, so a branch is dropped as soon as it goes over either limit.
+	With a prefix, the first len(prefix) functions taken off the ready queue only run on those resources.
+	"""
+	ready_queue = deque([FunctionInstance(dag.root)])
+	incomplete_map = {}  # Function id -> FunctionInstance still waiting on some of its predecessors
+	completed_map = {}
+	totals = [0, 0]  # Running time and cost
+	successors = {}  # Function id -> next_funcs sorted by id, so the search order is the same in every process
+
+	def search(depth):
+		this_func_instance = ready_queue.popleft()
+		function = this_func_instance.function
+		for resource in (Resource if depth >= len(prefix) else [prefix[depth]]):
+			func_time = function.get_resource_runtime(resource)
+			finish_time = this_func_instance.max_prev_time + func_time
+			new_time = max(totals[0], finish_time)
+			new_cost = totals[1] + (func_time * resource.value[0])
+			if new_time > dag.max_time or new_cost > dag.max_cost:
+				continue
+
+			# Apply the choice, logging how to undo it
+			undo_log = []
+			next_functions = successors.get(function.id)
+			if next_functions is None:
+				next_functions = successors[function.id] = sorted(function.next_funcs, key=lambda f: f.id)
+			for next_function in next_functions:
+				next_instance = incomplete_map.get(next_function.id)
+				if next_instance is None:
+					next_instance = FunctionInstance(next_function)
+					incomplete_map[next_function.id] = next_instance
+				undo_log.append((next_instance, next_instance.max_prev_time))
+				next_instance.num_prev_instances += 1
+				if finish_time > next_instance.max_prev_time:
+					next_instance.max_prev_time = finish_time
+				if next_instance.num_prev_instances == len(next_function.prev_funcs):
+					ready_queue.append(next_instance)
+					del incomplete_map[next_function.id]
+			completed_instance = FunctionInstance(function, resource, None, finish_time, this_func_instance.num_prev_instances, this_func_instance.max_prev_time)
+			completed_map[completed_instance] = resource
+			old_totals = (totals[0], totals[1])
+			(totals[0], totals[1]) = (new_time, new_cost)
+
+			if len(ready_queue) == 0:
+				valid_instance = DAGInstance(dag)
+				valid_instance.running_time = new_time
+				valid_instance.running_cost = new_cost
+				valid_instance.completed_map = dict(completed_map)
+				yield valid_instance
 			else:
-				dag_ready_queue.append(new_dag_instance)
+				yield from search(depth + 1)
+
+			# Undo the choice
+			(totals[0], totals[1]) = old_totals
+			del completed_map[completed_instance]
+			for next_instance, max_prev_time in reversed(undo_log):
+				if next_instance.num_prev_instances == len(next_instance.function.prev_funcs):
+					ready_queue.pop()
+					incomplete_map[next_instance.function.id] = next_instance
+				next_instance.num_prev_instances -= 1
+				next_instance.max_prev_time = max_prev_time
+				if next_instance.num_prev_instances == 0:
+					del incomplete_map[next_instance.function.id]
+		ready_queue.appendleft(this_func_instance)
+
+	yield from search(0)
@@ -0,0 +1,109 @@
+"""
+1. Fingerprint a DAG by its functions, edges, per-resource runtimes and memories, and the resource prices
+2. Look the fingerprint up in an LRU cache of Pareto frontiers, generating the frontier only on a miss
+3. Optionally save the cache to disk so the next process starts with it warm
+"""
+import hashlib
+import json
+import os
+from collections import OrderedDict
+
+from .dag_generation import Resource, build_dag_instance, gen_pareto_instances
+from .dag_picker import DAGSelector
+
+
+def dag_fingerprint(dag):
+	"""
+	A hash of everything the Pareto frontier depends on: the topology, runtimes and memories, and the resources
+	with their prices, so frontiers saved before the prices changed are not found again.
+	"""
+	functions = sorted(dag.gen_dep_queue(), key=lambda function: function.id)
+	structure = [[[res.name, res.value] for res in Resource]]
+	for function in functions:
+		structure.append((
+			function.id,
+			sorted(next_func.id for next_func in function.next_funcs),
+			[function.get_resource_runtime(res) for res in Resource],
+			[function.get_max_memory(res) for res in Resource],
+		))
+	return hashlib.sha256(json.dumps(structure).encode()).hexdigest()
+
+
+class FrontierCache:
+
+	def __init__(self, max_entries=1024, path=None):
+		self.max_entries = max_entries
+		self.path = path
+		# Fingerprint -> [frontier as a list of resource names per function in id order, built instances or None]
+		self.entries = OrderedDict()
+		self.hits = 0
+		self.misses = 0
+		if path is not None and os.path.exists(path):
+			self.load(path)
+
+	def __len__(self):
+		return len(self.entries)
+
+	def __contains__(self, dag):
+		return dag_fingerprint(dag) in self.entries
+
+	def get_pareto_instances(self, dag):
+		"""select_pareto_instances(gen_dag_instances(dag)), generated only if no DAG like it was seen before."""
+		fingerprint = dag_fingerprint(dag)
+		entry = self.entries.get(fingerprint)
+		if entry is not None:
+			self.hits += 1
+			self.entries.move_to_end(fingerprint)
+			if entry[1] is None:
+				entry[1] = self.__build_instances(dag, entry[0])
+			return entry[1]
+
+		self.misses += 1
+		instances = gen_pareto_instances(dag)
+		ids = sorted(function.id for function in dag.gen_dep_queue())
+		frontier = [[instance.id_res_map[fid].name for fid in ids] for instance in instances]
+		self.entries[fingerprint] = [frontier, instances]
+		if len(self.entries) > self.max_entries:
+			self.entries.popitem(last=False)
+		return instances
+
+	def get_selector(self, dag, sample_size):
+		return DAGSelector(self.get_pareto_instances(dag), sample_size)
+
+	def __build_instances(self, dag, frontier):
+		dep_queue = dag.gen_dep_queue()
+		ids = sorted(function.id for function in dep_queue)
+		instances = []
+		for res_names in frontier:
+			res_by_id = dict(zip(ids, res_names))
+			instances.append(build_dag_instance(dag, dep_queue, [Resource[res_by_id[function.id]] for function in dep_queue]))
+		return instances
+
+	def stats(self):
+		lookups = self.hits + self.misses
+		return {
+			'hits': self.hits,
+			'misses': self.misses,
+			'hit_rate': self.hits / lookups if lookups > 0 else 0.0,
+			'entries': len(self.entries),
+		}
+
+	def save(self, path=None):
+		"""Write every frontier, least recently used first, as JSON."""
+		path = path or self.path
+		assert path is not None, "Need a path to save the frontier cache to."
+		tmp_path = f'{path}.tmp'
+		with open(tmp_path, 'w') as f:
+			json.dump({'frontiers': [[fp, entry[0]] for fp, entry in self.entries.items()]}, f)
+		os.replace(tmp_path, path)
+
+	def load(self, path=None):
+		"""Add the frontiers saved at `path`. Instances are only built when a frontier is first looked up."""
+		path = path or self.path
+		with open(path) as f:
+			saved = json.load(f)
+		for fingerprint, frontier in saved['frontiers']:
+			self.entries[fingerprint] = [frontier, None]
+			self.entries.move_to_end(fingerprint)
+			if len(self.entries) > self.max_entries:
+				self.entries.popitem(last=False)
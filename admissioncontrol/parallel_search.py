@@ -0,0 +1,218 @@
+"""
+1. Split the search space into groups of prefixes: partial assignments of the first few functions
+2. Search on from each group on a worker process, sending back only that group's Pareto frontier, ties included
+3. Merge the frontiers with the same rules as select_pareto_instances
+"""
+import warnings
+from itertools import product
+from multiprocessing import Pool, cpu_count
+
+import numpy as np
+
+from .dag_evaluation import DAGEvaluator
+from .dag_generation import (MAX_PARETO_LABELS, Resource, ParetoFrontier, ParetoSearch, build_dag_instance,
+	build_pareto_instances, pareto_mask, search_order)
+from . import dag_selection
+
+PREFIXES_PER_PROCESS = 4  # More prefixes than processes evens out prefixes that take longer than others
+SEED_LABELS = 50  # Partial assignments kept by the quick search whose points every worker prunes with
+SPLIT_MAX_LABELS = 1000  # Split the label search once this many partial assignments are left, even with few costs
+MAX_EXHAUSTIVE_FUNCTIONS = 20  # Largest DAG the exhaustive search accepts, it evaluates 2^n assignments
+
+# Set in each worker by its initializer, so the DAG is only sent once per worker
+_worker_dag = None
+_worker_evaluator = None
+_worker_search = None  # (search order, max_labels, known points, functions assigned before the split)
+
+
+class ValidCandidate:
+	"""A compact result of generate_valid_dags that is cheap to send between processes."""
+
+	def __init__(self, running_time, running_cost, id_res_map):
+		self.running_time = running_time
+		self.running_cost = running_cost
+		self.id_res_map = id_res_map  # Function id -> Resource
+
+
+def choose_prefix_length(num_functions, processes):
+	"""Fewest leading functions to fix so there are enough prefixes to keep every process busy."""
+	length = 0
+	while length < num_functions and len(Resource) ** length < PREFIXES_PER_PROCESS * processes:
+		length += 1
+	return length
+
+
+def _init_generation_worker(dag):
+	global _worker_evaluator
+	_worker_evaluator = DAGEvaluator(dag)
+
+
+def _generation_frontier(args):
+	(prefix, block_size) = args
+	evaluator = _worker_evaluator
+	rows = []
+	times = []
+	costs = []
+	for block in evaluator.iter_all_assignments(block_size, prefix):
+		(running_times, running_costs) = evaluator.evaluate(block)
+		keep = pareto_mask(running_times, running_costs, keep_ties=True)
+		rows.append(block[keep])
+		times.append(running_times[keep])
+		costs.append(running_costs[keep])
+	rows = np.concatenate(rows)
+	times = np.concatenate(times)
+	costs = np.concatenate(costs)
+	keep = pareto_mask(times, costs, keep_ties=True)
+	return (rows[keep], times[keep], costs[keep])
+
+
+def _init_search_worker(order, max_labels, known_points, step):
+	global _worker_search
+	_worker_search = (order, max_labels, known_points, step)
+
+
+def _search_frontier(labels):
+	(order, max_labels, known_points, step) = _worker_search
+	search = ParetoSearch(order, max_labels, known_points, step, labels)
+	return (search.run(), search.truncated)
+
+
+def split_by_cost(labels, num_groups):
+	"""
+	The partial assignments of a ParetoSearch in at most num_groups groups of about the same size, each holding
+	all of the partial assignments of its costs. Partial assignments of different costs never merge, so searching
+	the groups apart loses little pruning.
+	"""
+	by_cost = {}
+	for entry in labels:
+		by_cost.setdefault(entry[0][0], []).append(entry)
+	target = len(labels) / num_groups
+	groups = [[]]
+	for cost in sorted(by_cost):
+		if len(groups[-1]) >= target:
+			groups.append([])
+		groups[-1].extend(by_cost[cost])
+	return groups
+
+
+def split_pareto_search(order, processes, max_labels=MAX_PARETO_LABELS):
+	"""
+	The ParetoSearch of `order`, run until its partial assignments have PREFIXES_PER_PROCESS distinct costs per
+	process (or there are SPLIT_MAX_LABELS of them), and its partial assignments split_by_cost for the workers.
+	It prunes with the points of a quick search that keeps only SEED_LABELS partial assignments.
+	"""
+	seeds = ParetoSearch(order, SEED_LABELS).run()
+	search = ParetoSearch(order, max_labels, [(cost, running_time) for (cost, running_time, _, _) in seeds])
+	num_groups = PREFIXES_PER_PROCESS * processes
+	while not search.done() and len(search.labels) < SPLIT_MAX_LABELS and \
+			len({label[0] for label, _, _ in search.labels}) < num_groups:
+		search.advance()
+	return (search, split_by_cost(search.labels, num_groups))
+
+
+def parallel_pareto_instances(dag, processes=None, prefix_length=None, block_size=1 << 16,
+		max_labels=MAX_PARETO_LABELS, exhaustive=False):
+	"""
+	Same as gen_pareto_instances(dag), searched on a pool of worker processes. The ParetoSearch runs here until
+	split_pareto_search splits it, then each group of partial assignments goes to a worker. Workers search on
+	from their group, pruning with every point found so far, and send back their frontier points with whether
+	each is reached twice. A point that two groups reach is reached twice too. max_labels applies to each search.
+	With `exhaustive`, workers instead evaluate every assignment that starts with one of the prefixes of
+	prefix_length functions with DAGEvaluator, in blocks of block_size, which is only practical for small DAGs.
+	"""
+	processes = processes or cpu_count()
+	if exhaustive:
+		return _exhaustive_pareto_instances(dag, processes, prefix_length, block_size)
+	dep_queue = dag.gen_dep_queue()
+	order = search_order(dep_queue)
+	(search, groups) = split_pareto_search(order, processes, max_labels)
+
+	with Pool(processes, initializer=_init_search_worker,
+			initargs=(order, max_labels, search.known_points(), search.step)) as pool:
+		frontiers = pool.map(_search_frontier, groups)
+
+	merged = {}  # (cost, running time) -> [assignment, whether reached twice]
+	truncated = search.truncated
+	for (points, group_truncated) in frontiers:
+		truncated = truncated or group_truncated
+		for (cost, running_time, assignment, twice) in points:
+			entry = merged.get((cost, running_time))
+			if entry is None:
+				merged[(cost, running_time)] = [assignment, twice]
+			else:
+				entry[1] = True
+	if truncated:
+		warnings.warn(f"The Pareto frontier of DAG {dag.id} is approximate: more than {max_labels} partial "
+			"assignments were left at some step.", RuntimeWarning)
+	assignments = []
+	best_time = None
+	for point in sorted(merged):
+		if best_time is None or point[1] < best_time:
+			best_time = point[1]
+			(assignment, twice) = merged[point]
+			if not twice:
+				assignments.append(assignment)
+	return build_pareto_instances(dag, dep_queue, order, assignments)
+
+
+def _exhaustive_pareto_instances(dag, processes, prefix_length, block_size):
+	"""select_pareto_instances(gen_dag_instances(dag)), evaluating every assignment on a pool of worker processes."""
+	evaluator = DAGEvaluator(dag)
+	if evaluator.num_functions() > MAX_EXHAUSTIVE_FUNCTIONS:
+		raise ValueError(f"DAG {dag.id} has {evaluator.num_functions()} functions, the exhaustive search only "
+			f"takes up to {MAX_EXHAUSTIVE_FUNCTIONS}.")
+	if prefix_length is None:
+		prefix_length = choose_prefix_length(evaluator.num_functions(), processes)
+	prefixes = [(prefix, block_size) for prefix in product(range(len(Resource)), repeat=prefix_length)]
+
+	with Pool(processes, initializer=_init_generation_worker, initargs=(dag,)) as pool:
+		frontiers = pool.map(_generation_frontier, prefixes)
+
+	rows = np.concatenate([frontier[0] for frontier in frontiers])
+	keep = pareto_mask(np.concatenate([frontier[1] for frontier in frontiers]), np.concatenate([frontier[2] for frontier in frontiers]))
+	# Prefixes are in enumeration order and so are the rows within each, so this is gen_dag_instances order
+	return [build_dag_instance(dag, evaluator.dep_queue, [evaluator.resources[r] for r in row]) for row in rows[keep]]
+
+
+def _init_selection_worker(dag):
+	global _worker_dag
+	_worker_dag = dag
+
+
+def _selection_frontier(prefix):
+	frontier = ParetoFrontier()
+	for instance in dag_selection.generate_valid_dags(None, _worker_dag, prefix):
+		id_res_map = {func_instance.function.id: resource for func_instance, resource in instance.completed_map.items()}
+		frontier.add(ValidCandidate(instance.running_time, instance.running_cost, id_res_map))
+	return frontier.get_pareto_instances(keep_ties=True)
+
+
+def parallel_valid_frontier(dag, processes=None, prefix_length=None):
+	"""
+	The Pareto frontier (by select_pareto_instances' rules) of generate_valid_dags(None, dag), searched on a pool
+	of worker processes. Returns ValidCandidates rather than DAGInstances.
+	"""
+	processes = processes or cpu_count()
+	if prefix_length is None:
+		num_functions = len(_reachable_functions(dag.root))
+		prefix_length = choose_prefix_length(num_functions, processes)
+	prefixes = list(product(list(dag_selection.Resource), repeat=prefix_length))
+
+	with Pool(processes, initializer=_init_selection_worker, initargs=(dag,)) as pool:
+		frontiers = pool.map(_selection_frontier, prefixes)
+
+	merged = ParetoFrontier()
+	for frontier in frontiers:
+		merged.extend(frontier)
+	return merged.get_pareto_instances()
+
+
+def _reachable_functions(root):
+	seen = {root.id: root}
+	stack = [root]
+	while stack:
+		for next_func in stack.pop().next_funcs:
+			if next_func.id not in seen:
+				seen[next_func.id] = next_func
+				stack.append(next_func)
+	return list(seen.values())
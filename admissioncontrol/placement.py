@@ -0,0 +1,164 @@
+"""
+1. Index each resource type's nodes by free memory
+2. Place a DAG instance's functions largest first, using first-fit or best-fit on that index
+3. Commit only if every function fits, otherwise roll every node back
+"""
+from bisect import bisect_left, insort
+from enum import Enum
+
+from .dag_generation import Resource
+
+
+BUCKET_LOAD = 256  # Entries per bucket of a SortedBuckets when it is built
+
+
+class PlacementPolicy(Enum):
+	FIRST_FIT_DECREASING = 1  # Earliest node (in cluster order) with enough memory
+	BEST_FIT_DECREASING = 2   # Node with the least memory that is still enough
+
+
+class SortedBuckets:
+	"""
+	A sorted list of (memory, position) split into buckets of at most 2 * load entries, with the largest entry of
+	each bucket in `maxes`. An add or remove binary searches `maxes` and then its bucket, and moves at most
+	2 * load entries of that bucket, so updates take O(log n) time rather than the O(n) of a single list.
+	"""
+
+	def __init__(self, entries, load=BUCKET_LOAD):
+		entries = sorted(entries)
+		self.load = load
+		self.buckets = [entries[i:i + load] for i in range(0, len(entries), load)]
+		self.maxes = [bucket[-1] for bucket in self.buckets]
+
+	def add(self, entry):
+		if not self.buckets:
+			self.buckets.append([entry])
+			self.maxes.append(entry)
+			return
+		k = min(bisect_left(self.maxes, entry), len(self.buckets) - 1)
+		bucket = self.buckets[k]
+		insort(bucket, entry)
+		self.maxes[k] = bucket[-1]
+		if len(bucket) > 2 * self.load:
+			self.buckets[k:k + 1] = [bucket[:self.load], bucket[self.load:]]
+			self.maxes[k:k + 1] = [bucket[self.load - 1], bucket[-1]]
+
+	def remove(self, entry):
+		k = bisect_left(self.maxes, entry)
+		bucket = self.buckets[k]
+		del bucket[bisect_left(bucket, entry)]
+		if bucket:
+			self.maxes[k] = bucket[-1]
+		else:
+			del self.buckets[k]
+			del self.maxes[k]
+
+	def ceiling(self, entry):
+		"""The smallest entry that is at least `entry`, or None."""
+		k = bisect_left(self.maxes, entry)
+		if k == len(self.maxes):
+			return None
+		bucket = self.buckets[k]
+		return bucket[bisect_left(bucket, entry)]
+
+
+class NodeIndex:
+	"""
+	Free memory of a list of nodes: a max segment tree over node order for first-fit, plus (memory, position)
+	pairs in SortedBuckets for best-fit. Both are updated in O(log n).
+	"""
+
+	def __init__(self, nodes):
+		self.nodes = list(nodes)
+		self.size = 1
+		while self.size < len(self.nodes):
+			self.size *= 2
+		self.tree = [-1] * (2 * self.size)
+		for i, node in enumerate(self.nodes):
+			self.tree[self.size + i] = node.memory
+		for i in range(self.size - 1, 0, -1):
+			self.tree[i] = max(self.tree[2 * i], self.tree[2 * i + 1])
+		self.by_memory = SortedBuckets((node.memory, i) for i, node in enumerate(self.nodes))
+
+	def update(self, i, memory):
+		"""Set the free memory of self.nodes[i]."""
+		node = self.nodes[i]
+		self.by_memory.remove((node.memory, i))
+		self.by_memory.add((memory, i))
+		node.memory = memory
+		j = self.size + i
+		self.tree[j] = memory
+		j //= 2
+		while j >= 1:
+			self.tree[j] = max(self.tree[2 * j], self.tree[2 * j + 1])
+			j //= 2
+
+	def first_fit(self, needed):
+		if not self.nodes or self.tree[1] < needed:
+			return None
+		j = 1
+		while j < self.size:
+			j = 2 * j if self.tree[2 * j] >= needed else 2 * j + 1
+		return j - self.size
+
+	def best_fit(self, needed):
+		fit = self.by_memory.ceiling((needed, -1))
+		if fit is None:
+			return None
+		return fit[1]
+
+
+class PlacementEngine:
+	"""
+	Places DAG instances on a Cluster. Once an engine is made for a cluster, it should be the only thing
+	changing its nodes' memory, otherwise the indexes go stale.
+	"""
+
+	def __init__(self, cluster, policy=PlacementPolicy.BEST_FIT_DECREASING):
+		self.cluster = cluster
+		self.policy = policy
+		self.indexes = {}
+		self.positions = {}  # Node id -> (resource, position in its index)
+		for res in Resource:
+			index = NodeIndex(cluster.nodes_by_res[res])
+			self.indexes[res] = index
+			for i, node in enumerate(index.nodes):
+				self.positions[node.id] = (res, i)
+
+	def find_node(self, res, needed):
+		index = self.indexes[res]
+		if self.policy == PlacementPolicy.FIRST_FIT_DECREASING:
+			return index.first_fit(needed)
+		return index.best_fit(needed)
+
+	def place(self, dag_instance):
+		"""
+		Map every function of dag_instance to a node id, taking the memory it needs.
+		Either every function is placed, or nothing changes and an empty map is returned.
+		"""
+		function_place_map = {}
+		undo_log = []
+		for res, res_list in dag_instance.functions_per_resource.items():
+			index = self.indexes[res]
+			for func_id, func_mem in sorted(res_list, key=lambda x: x[1], reverse=True):
+				i = self.find_node(res, func_mem)
+				if i is None:
+					self.__rollback(undo_log)
+					return {}
+				node = index.nodes[i]
+				undo_log.append((index, i, node.memory))
+				index.update(i, node.memory - func_mem)
+				function_place_map[func_id] = node.id
+		return function_place_map
+
+	def release(self, dag_instance, function_place_map):
+		"""Give back the memory taken by a successful `place`."""
+		for res_list in dag_instance.functions_per_resource.values():
+			for func_id, func_mem in res_list:
+				(res, i) = self.positions[function_place_map[func_id]]
+				index = self.indexes[res]
+				index.update(i, index.nodes[i].memory + func_mem)
+
+	def __rollback(self, undo_log):
+		for index, i, memory in reversed(undo_log):
+			index.update(i, memory)
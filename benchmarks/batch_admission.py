@@ -0,0 +1,67 @@
+"""
+Compare admitting a burst of requests one at a time against admit_batch, with both trying the same number of
+candidate instances per request, so the difference in requests admitted comes from the batch's ordering.
+Run from the repository root: python -m benchmarks.batch_admission
+"""
+from random import Random
+from time import perf_counter
+
+from admissioncontrol.batch_admission import admit_batch
+from admissioncontrol.dag_generation import DAG, Function, Resource
+from admissioncontrol.dag_picker import Cluster, DAGSelector, Node
+from admissioncontrol.frontier_cache import FrontierCache
+
+
+def make_dag(name: str, num_funcs: int, rng: Random) -> DAG:
+    """A random DAG where each function depends on one or two of the few functions before it."""
+    funcs = []
+    for i in range(num_funcs):
+        runtimes = {Resource.CPU: 3 * rng.randint(1, 5), Resource.GPU: rng.randint(1, 5)}
+        memories = {Resource.CPU: rng.randint(5, 40), Resource.GPU: rng.randint(2, 10)}
+        funcs.append(Function(f'{name}_{i}', runtimes, memories, set(), set()))
+    for j in range(1, num_funcs):
+        for i in rng.sample(range(max(0, j - 3), j), min(j, rng.randint(1, 2))):
+            funcs[i].next_funcs.add(funcs[j])
+            funcs[j].prev_funcs.add(funcs[i])
+    return DAG(name, funcs[0], num_funcs)
+
+
+def make_cluster(num_nodes: int, rng: Random) -> Cluster:
+    return Cluster([Node(i, rng.choice(list(Resource))) for i in range(num_nodes)])
+
+
+def make_requests(dags, num_requests: int, rng: Random):
+    requests = []
+    for _ in range(num_requests):
+        dag = rng.choice(dags)
+        requests.append((dag, rng.randint(dag.num_funcs, 3 * dag.num_funcs), rng.randint(10, 60)))
+    return requests
+
+
+def admit_one_at_a_time(requests, cluster, cache, max_attempts):
+    """Admit requests in arrival order, each trying up to max_attempts of its valid instances, sampled at random."""
+    start = perf_counter()
+    admitted = 0
+    for (dag, price_slo, time_slo) in requests:
+        selector = DAGSelector(cache.get_pareto_instances(dag), max_attempts)
+        for instance in selector.get_sample_list(price_slo, time_slo):
+            if selector.get_placements(cluster, instance):
+                admitted += 1
+                break
+    return admitted, perf_counter() - start
+
+
+if __name__ == "__main__":
+    rng = Random(0)
+    dags = [make_dag(f'dag{i}', rng.randint(4, 12), rng) for i in range(20)]
+    requests = make_requests(dags, 20000, rng)
+    cache = FrontierCache()
+    for dag in dags:
+        cache.get_pareto_instances(dag)  # Warm the cache so both paths only measure admission
+
+    for max_attempts in (1, 8):
+        admitted, elapsed = admit_one_at_a_time(requests, make_cluster(2000, Random(1)), cache, max_attempts)
+        print(f"{max_attempts} attempts, one at a time: {admitted} admitted, {len(requests) / elapsed:.0f} requests/s")
+        result = admit_batch(requests, make_cluster(2000, Random(1)), cache, max_attempts=max_attempts)
+        print(f"{max_attempts} attempts, batch:         {result.num_admitted()} admitted, "
+              f"{result.requests_per_second():.0f} requests/s")
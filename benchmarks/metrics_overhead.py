@@ -0,0 +1,42 @@
+"""
+Measure what the built-in MetricsCollector adds to a simulation, per recorded event.
+Run from the repository root: python -m benchmarks.metrics_overhead
+"""
+from time import perf_counter
+
+from simulator.event_queue import StreamingEventQueue
+from simulator.resource import Resource, ResourcePool, ResourceType
+from workloads.toy.linear_dag import linear_dag
+from workloads.toy.single_linear_workload import SimpleSystem
+
+
+def make_system(requests: int, collect_metrics: bool) -> SimpleSystem:
+    pools = {
+        'STD_CPU_POOL': ResourcePool('STD_CPU_POOL', ResourceType.CPU,
+                                     [(f'STD_CPU_{i}', Resource('STD_CPU', ResourceType.CPU)) for i in range(8)]),
+        'STD_GPU_POOL': ResourcePool('STD_GPU_POOL', ResourceType.GPU,
+                                     [(f'STD_GPU_{i}', Resource('STD_GPU', ResourceType.GPU)) for i in range(8)]),
+    }
+    events = StreamingEventQueue([(linear_dag, ((t, None) for t in range(requests)))])
+    system = SimpleSystem(events, pools)
+    if not collect_metrics:
+        system.metrics = None
+    return system
+
+
+def timed_run(requests: int, collect_metrics: bool) -> float:
+    system = make_system(requests, collect_metrics)
+    start = perf_counter()
+    system.run_event_driven()
+    return perf_counter() - start
+
+
+if __name__ == "__main__":
+    requests = 200000
+    # Arrival and completion per request, start and finish per function
+    recorded = requests * (2 + 2 * len(linear_dag.functions))
+    off = min(timed_run(requests, False) for _ in range(3))
+    on = min(timed_run(requests, True) for _ in range(3))
+    print(f"{requests} requests, {recorded} recorded events")
+    print(f"metrics off: {off:.2f}s, on: {on:.2f}s ({(on - off) / off:+.1%})")
+    print(f"overhead per recorded event: {(on - off) / recorded * 1e9:.0f} ns")
@@ -0,0 +1,73 @@
+"""
+Compare the serial pruned Pareto search, gen_pareto_instances, with parallel_pareto_instances, which splits the
+same search over a process pool, on DAGs wide enough for the serial search to take seconds.
+Each group of partial assignments is also searched on its own in this process, to report the total work over
+every group and how long the search takes on `processes` cores when the groups are spread over them.
+Wall-clock time only shows the speedup on a machine with that many cores.
+Run from the repository root: python -m benchmarks.parallel_pareto [processes]
+"""
+import heapq
+import sys
+from multiprocessing import cpu_count
+from random import Random
+from time import perf_counter
+
+from admissioncontrol.dag_generation import DAG, Function, ParetoSearch, Resource, gen_pareto_instances, search_order
+from admissioncontrol.parallel_search import parallel_pareto_instances, split_pareto_search
+
+
+def make_wide_dag(name: str, num_funcs: int, rng: Random) -> DAG:
+    """A random DAG where each function depends on one or two of any of the functions before it."""
+    funcs = []
+    for i in range(num_funcs):
+        runtimes = {Resource.CPU: 3 * rng.randint(1, 5), Resource.GPU: rng.randint(1, 5)}
+        memories = {Resource.CPU: 10, Resource.GPU: 5}
+        funcs.append(Function(f'{name}_{i}', runtimes, memories, set(), set()))
+    for j in range(1, num_funcs):
+        for i in rng.sample(range(j), min(j, rng.randint(1, 2))):
+            funcs[i].next_funcs.add(funcs[j])
+            funcs[j].prev_funcs.add(funcs[i])
+    return DAG(name, funcs[0], num_funcs)
+
+
+def makespan(times, processes: int) -> float:
+    """How long `times` take on `processes` cores, longest first onto the least loaded core like Pool.map."""
+    loads = [0.0] * processes
+    for t in sorted(times, reverse=True):
+        heapq.heapreplace(loads, loads[0] + t)
+    return max(loads)
+
+
+def group_times(dag: DAG, processes: int):
+    """Time the search before the split and of each group parallel_pareto_instances hands to a worker."""
+    order = search_order(dag.gen_dep_queue())
+    start = perf_counter()
+    (search, groups) = split_pareto_search(order, processes, None)
+    split_time = perf_counter() - start
+    times = []
+    for group in groups:
+        start = perf_counter()
+        ParetoSearch(order, None, search.known_points(), search.step, group).run()
+        times.append(perf_counter() - start)
+    return split_time, times
+
+
+if __name__ == "__main__":
+    processes = int(sys.argv[1]) if len(sys.argv) > 1 else max(cpu_count(), 4)
+    print(f"{processes} processes on {cpu_count()} cores")
+    for num_funcs, seed in [(40, 1), (45, 0), (50, 0), (50, 2)]:
+        dag = make_wide_dag(f'wide{num_funcs}_{seed}', num_funcs, Random(seed))
+
+        start = perf_counter()
+        serial = gen_pareto_instances(dag, max_labels=None)
+        serial_time = perf_counter() - start
+        start = perf_counter()
+        parallel = parallel_pareto_instances(dag, processes, max_labels=None)
+        parallel_time = perf_counter() - start
+        assert [i.id_res_map for i in serial] == [i.id_res_map for i in parallel]
+
+        split_time, times = group_times(dag, processes)
+        on_cores = split_time + makespan(times, processes)
+        print(f"{dag.id}: serial {serial_time:.2f}s, parallel wall clock {parallel_time:.2f}s, "
+              f"{len(times)} groups {split_time + sum(times):.2f}s in total, "
+              f"{on_cores:.2f}s on {processes} cores ({serial_time / on_cores:.1f}x)")
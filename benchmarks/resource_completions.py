@@ -0,0 +1,60 @@
+"""
+Compare completion tracking in `Resource` against the old full scan of `active`.
+Run from the repository root: python -m benchmarks.resource_completions
+"""
+import sys
+from random import Random
+from time import perf_counter
+
+from simulator.dag import Function
+from simulator.resource import Resource, ResourceType
+from simulator.runtime import ConstantTime
+
+
+class ScanResource(Resource):
+    """The previous implementation: scan every active function on each tick."""
+
+    def remove_at_time(self, curr_time):
+        removed_functions = []
+        for k, v in self.active.copy().items():
+            if curr_time >= v[1]:
+                (freed_space, finish_time) = self.active.pop(k)
+                self.available_space += freed_space
+                if finish_time == self.nearest_finish:
+                    self.nearest_finish = min((v[1] for v in self.active.values()), default=sys.maxsize)
+                removed_functions.append(k)
+        return removed_functions
+
+
+def make_functions(count: int, seed: int = 0):
+    rng = Random(seed)
+    return [Function(unique_id=f'f{i}', resources={
+        'BENCH_CPU': {
+            'type': ResourceType.CPU,
+            'space': 0.0,
+            'exec': ConstantTime(rng.randint(1, 10 * count)),
+        }
+    }) for i in range(count)]
+
+
+def simulate(resource_class, functions, ticks: int) -> float:
+    """Keep `len(functions)` functions running and tick the resource, restarting whatever finishes."""
+    resource = resource_class('BENCH_CPU', ResourceType.CPU)
+    by_id = {fun.unique_id: fun for fun in functions}
+    for fun in functions:
+        resource.add_function(fun, '0', 0)
+    start = perf_counter()
+    for t in range(1, ticks + 1):
+        for (fid, _) in resource.remove_at_time(t):
+            resource.add_function(by_id[fid], str(t), t)
+    return perf_counter() - start
+
+
+if __name__ == "__main__":
+    ticks = 10000
+    print(f"{'concurrent':>10} {'scan (s)':>10} {'heap (s)':>10} {'speedup':>8}")
+    for count in [10, 100, 1000]:
+        functions = make_functions(count)
+        scan = simulate(ScanResource, functions, ticks)
+        heap = simulate(Resource, functions, ticks)
+        print(f"{count:>10} {scan:>10.3f} {heap:>10.3f} {scan / heap:>7.1f}x")
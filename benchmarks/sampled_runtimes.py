@@ -0,0 +1,43 @@
+"""
+Compare per-call cost of the block-sampled runtimes against drawing from the generator on every call.
+Run from the repository root: python -m benchmarks.sampled_runtimes
+"""
+from time import perf_counter
+
+import numpy as np
+
+from simulator.runtime import ConstantTime, LogNormalTime, AzurePercentileTime, EmpiricalTime
+
+
+class PerCallLogNormalTime:
+    """Drawing one sample from the generator on each call."""
+
+    def __init__(self, mu, sigma, seed=None):
+        self.mu = mu
+        self.sigma = sigma
+        self.rng = np.random.default_rng(seed)
+
+    def get_runtime(self):
+        return int(round(self.rng.lognormal(self.mu, self.sigma)))
+
+
+def time_calls(runtime, calls: int) -> float:
+    get_runtime = runtime.get_runtime
+    start = perf_counter()
+    for _ in range(calls):
+        get_runtime()
+    return (perf_counter() - start) / calls * 1e9
+
+
+if __name__ == "__main__":
+    calls = 1000000
+    runtimes = [
+        ('constant', ConstantTime(10)),
+        ('per-call log-normal', PerCallLogNormalTime(2.0, 1.0, seed=0)),
+        ('log-normal', LogNormalTime(2.0, 1.0, seed=0)),
+        ('empirical', EmpiricalTime(np.random.default_rng(0).pareto(1.5, 10000) * 10, seed=0)),
+        ('azure percentiles', AzurePercentileTime({0: 1, 1: 2, 25: 10, 50: 40, 75: 200, 99: 5000, 100: 60000}, seed=0)),
+    ]
+    print(f"{'runtime':>20} {'ns/call':>8}")
+    for name, runtime in runtimes:
+        print(f"{name:>20} {time_calls(runtime, calls):>8.0f}")
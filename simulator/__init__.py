@@ -1,5 +1,9 @@
+from .completion_calendar import *
 from .dag import *
 from .event_queue import *
+from .metrics import *
+from .profiling import *
+from .replicates import *
 from .resource import *
 from .runtime import *
 from .system import *
\ No newline at end of file
@@ -0,0 +1,145 @@
+from bisect import bisect_left, insort
+from typing import Dict, List, Optional, Tuple, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from .resource import Resource
+
+BUCKET_LOAD = 256  # Entries per bucket of a SortedBuckets when it is built
+
+
+class SortedBuckets:
+    """
+    A sorted list of (space, position) split into buckets of at most 2 * load entries, with the largest entry
+    of each bucket kept in `_maxes`. An add or remove binary searches `_maxes` and then its bucket, and moves at
+    most 2 * load entries of that bucket, so updates take O(log n) time rather than the O(n) of a single list.
+    """
+    _load: int
+    _buckets: List[List[Tuple[float, int]]]
+    _maxes: List[Tuple[float, int]]
+
+    def __init__(self, entries, load: int = BUCKET_LOAD):
+        entries = sorted(entries)
+        self._load = load
+        self._buckets = [entries[i:i + load] for i in range(0, len(entries), load)]
+        self._maxes = [bucket[-1] for bucket in self._buckets]
+
+    def __len__(self) -> int:
+        return sum(len(bucket) for bucket in self._buckets)
+
+    def add(self, entry: Tuple[float, int]):
+        if not self._buckets:
+            self._buckets.append([entry])
+            self._maxes.append(entry)
+            return
+        k = min(bisect_left(self._maxes, entry), len(self._buckets) - 1)
+        bucket = self._buckets[k]
+        insort(bucket, entry)
+        self._maxes[k] = bucket[-1]
+        if len(bucket) > 2 * self._load:
+            self._buckets[k:k + 1] = [bucket[:self._load], bucket[self._load:]]
+            self._maxes[k:k + 1] = [bucket[self._load - 1], bucket[-1]]
+
+    def remove(self, entry: Tuple[float, int]):
+        k = bisect_left(self._maxes, entry)
+        bucket = self._buckets[k]
+        del bucket[bisect_left(bucket, entry)]
+        if bucket:
+            self._maxes[k] = bucket[-1]
+        else:
+            del self._buckets[k]
+            del self._maxes[k]
+
+    def ceiling(self, entry: Tuple[float, int]) -> Optional[Tuple[float, int]]:
+        """The smallest entry that is at least `entry`, or None."""
+        k = bisect_left(self._maxes, entry)
+        if k == len(self._maxes):
+            return None
+        bucket = self._buckets[k]
+        return bucket[bisect_left(bucket, entry)]
+
+
+class CapacityIndex:
+    """
+    An index over the `available_space` of a fixed list of resources.
+    A max segment tree over insertion order answers first-fit and worst-fit, and (space, position) pairs in
+    SortedBuckets answer best-fit; both are kept up to date by `update` in O(log n) as capacity changes.
+    """
+    resources: List['Resource']
+    _positions: Dict[int, int]          # id(resource) -> position in `resources`
+    _size: int                          # Number of leaves in the tree, a power of two
+    _tree: List[float]                  # Max available space of each subtree, leaves start at `_size`
+    _by_space: SortedBuckets            # (available space, position)
+
+    def __init__(self, _resources: List['Resource']):
+        self.resources = list(_resources)
+        self._positions = {id(r): i for i, r in enumerate(self.resources)}
+        self._size = 1
+        while self._size < len(self.resources):
+            self._size *= 2
+        self._tree = [-1.0] * (2 * self._size)
+        for i, r in enumerate(self.resources):
+            self._tree[self._size + i] = r.available_space
+        for node in range(self._size - 1, 0, -1):
+            self._tree[node] = max(self._tree[2 * node], self._tree[2 * node + 1])
+        self._by_space = SortedBuckets((r.available_space, i) for i, r in enumerate(self.resources))
+
+    def __len__(self) -> int:
+        return len(self.resources)
+
+    def update(self, resource: 'Resource'):
+        """Record a change in `resource.available_space`."""
+        pos = self._positions[id(resource)]
+        node = self._size + pos
+        old = self._tree[node]
+        new = resource.available_space
+        if old == new:
+            return
+        self._by_space.remove((old, pos))
+        self._by_space.add((new, pos))
+        self._tree[node] = new
+        node //= 2
+        while node >= 1:
+            best = max(self._tree[2 * node], self._tree[2 * node + 1])
+            if self._tree[node] == best:
+                break
+            self._tree[node] = best
+            node //= 2
+
+    def first_fit(self, needed: float) -> Optional['Resource']:
+        """The earliest resource with at least `needed` space."""
+        if not self.resources or self._tree[1] < needed:
+            return None
+        node = 1
+        while node < self._size:
+            node = 2 * node if self._tree[2 * node] >= needed else 2 * node + 1
+        return self.resources[node - self._size]
+
+    def best_fit(self, needed: float) -> Optional['Resource']:
+        """The resource with the least space that is still at least `needed`, earliest first on ties."""
+        fit = self._by_space.ceiling((needed, -1))
+        if fit is None:
+            return None
+        return self.resources[fit[1]]
+
+    def worst_fit(self, needed: float) -> Optional['Resource']:
+        """The resource with the most space, earliest first on ties, if it has at least `needed`."""
+        if not self.resources or self._tree[1] < needed:
+            return None
+        return self.first_fit(self._tree[1])
+
+    def all_fits(self, needed: float) -> List['Resource']:
+        """Every resource with at least `needed` space, in insertion order."""
+        fits = []
+        if not self.resources:
+            return fits
+        stack = [1]
+        while stack:
+            node = stack.pop()
+            if self._tree[node] < needed:
+                continue
+            if node >= self._size:
+                fits.append(self.resources[node - self._size])
+            else:
+                stack.append(2 * node + 1)
+                stack.append(2 * node)
+        return fits
@@ -0,0 +1,53 @@
+from heapq import heappop, heappush
+from typing import Dict, List, TYPE_CHECKING
+
+import sys
+
+if TYPE_CHECKING:
+    from .resource import Resource
+
+
+class CompletionCalendar:
+    """
+    A cluster-wide calendar of upcoming function completions, with one bucket per millisecond.
+    Resources register their finish times here so a scheduler only has to visit the resources that actually
+    have something finishing, rather than every resource in every pool.
+    """
+    _buckets: Dict[int, List['Resource']]
+    _times: List[int]  # Heap of the distinct times that have a bucket
+
+    def __init__(self):
+        self._buckets = {}
+        self._times = []
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+    def register(self, resource: 'Resource', finish_time: int):
+        """Note that `resource` has a function finishing at `finish_time`."""
+        bucket = self._buckets.get(finish_time)
+        if bucket is None:
+            self._buckets[finish_time] = [resource]
+            heappush(self._times, finish_time)
+        else:
+            bucket.append(resource)
+
+    def peek(self) -> int:
+        """Earliest registered finish time that is still live, or sys.maxsize if nothing is registered."""
+        while self._times:
+            t = self._times[0]
+            # Resources may have freed the function early (e.g. `remove_function`), which leaves stale entries
+            if any(resource.nearest_finish <= t for resource in self._buckets[t]):
+                return t
+            heappop(self._times)
+            del self._buckets[t]
+        return sys.maxsize
+
+    def pop_due(self, curr_time: int) -> List['Resource']:
+        """Remove and return every resource with a function finishing at or before `curr_time`, without duplicates."""
+        due = {}
+        while self._times and self._times[0] <= curr_time:
+            for resource in self._buckets.pop(heappop(self._times)):
+                if resource.nearest_finish <= curr_time:
+                    due[id(resource)] = resource
+        return list(due.values())
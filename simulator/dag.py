@@ -1,7 +1,7 @@
 from copy import deepcopy
 from dataclasses import dataclass
 from networkx import DiGraph, is_directed_acyclic_graph, topological_sort
-from typing import List, Dict, Optional, Union
+from typing import Any, List, Dict, Optional, Tuple, Union
 
 
 @dataclass
@@ -19,6 +19,7 @@ class Dag:
     slo: Optional[int]
     graph: DiGraph
     sealed: bool
+    _compiled: Optional['CompiledDag']  # Built once the DAG is sealed
 
     # TODO: SLOs are just defined as ints for now, need to figure out what they look like
     def __init__(self, _name: str, funs: List[Function]=[], _slo: Optional[int] = None):
@@ -27,6 +28,7 @@ class Dag:
         self.slo = _slo
         self.graph = DiGraph()
         self.sealed = False
+        self._compiled = None
         for fun in funs:
             self.add_function(fun)
 
@@ -67,14 +69,15 @@ class Dag:
     # Haven't decided on the way we should interact with the execution order
     # The following method is one option
     def get_topological_execution_order(self) -> List[Function]:
+        if self.sealed:
+            return list(self._sealed_topological_order())
         sorted_uids = topological_sort(self.graph)
         return list(map(lambda uid: self.functions[uid], sorted_uids))
 
     # The following methods are another
     def execute(self):
         self.sealed = True
-        sorted_uids = topological_sort(self.graph)
-        self._order = list(map(lambda uid: self.functions[uid], sorted_uids))
+        self._order = self._sealed_topological_order()
         self._pos = 0
 
     def next_function(self) -> Optional[Function]:
@@ -93,6 +96,193 @@ class Dag:
         else:
             return None
 
+    def new_execution(self, input: Any = None) -> 'DagExecution':
+        """Seal the DAG and create a lightweight execution state for a single invocation of it, given `input`."""
+        self.sealed = True
+        return DagExecution(self, input)
+
+    def compile(self) -> 'CompiledDag':
+        """Seal the DAG and build (once) its compact, integer-indexed representation."""
+        self.sealed = True
+        if self._compiled is None:
+            self._compiled = CompiledDag(self)
+        return self._compiled
+
+    def _sealed_topological_order(self) -> Tuple[Function, ...]:
+        # Sealed DAGs can't change, so the order is computed once and shared by every execution
+        assert self.sealed
+        return self.compile().functions
+
+
+class CompiledDag:
+    """
+    A frozen, array-based view of a sealed DAG for scheduler hot paths.
+    Functions are numbered in topological order, so iterating `range(len(self))` visits every function after
+    all of its predecessors. Edges are stored CSR-style: the successors of function `i` are
+    `succ[succ_offsets[i]:succ_offsets[i + 1]]`, and likewise for predecessors.
+    """
+    dag: Dag
+    functions: Tuple[Function, ...]               # Index -> function
+    index: Dict[str, int]                         # Function id -> index
+    succ_offsets: Tuple[int, ...]
+    succ: Tuple[int, ...]
+    pred_offsets: Tuple[int, ...]
+    pred: Tuple[int, ...]
+    in_degree: Tuple[int, ...]
+    order: Tuple[int, ...]                        # Topological order of indices, i.e. 0..n-1
+    critical_path: Dict[str, Tuple[int, ...]]     # Resource name -> longest 'exec' time from each function to a sink
+
+    def __init__(self, _dag: Dag):
+        assert _dag.sealed, "Only sealed DAGs can be compiled."
+        self.dag = _dag
+        self.functions = tuple(map(lambda uid: _dag.functions[uid], topological_sort(_dag.graph)))
+        self.index = {fun.unique_id: i for (i, fun) in enumerate(self.functions)}
+        n = len(self.functions)
+        self.order = tuple(range(n))
+
+        succ_lists = [[] for _ in range(n)]
+        pred_lists = [[] for _ in range(n)]
+        for (u, v) in _dag.graph.edges:
+            succ_lists[self.index[u]].append(self.index[v])
+            pred_lists[self.index[v]].append(self.index[u])
+        (self.succ_offsets, self.succ) = self.__to_csr(succ_lists)
+        (self.pred_offsets, self.pred) = self.__to_csr(pred_lists)
+        self.in_degree = tuple(len(p) for p in pred_lists)
+
+        # Only resources that every function can run on have a meaningful critical path
+        common = set.intersection(*(set(fun.resources) for fun in self.functions)) if n > 0 else set()
+        self.critical_path = {}
+        for rname in sorted(common):
+            lengths = [0] * n
+            for i in reversed(self.order):
+                longest_after = max((lengths[j] for j in self.successors(i)), default=0)
+                lengths[i] = self.functions[i].resources[rname]['exec'].expected_runtime() + longest_after
+            self.critical_path[rname] = tuple(lengths)
+
+    def __len__(self) -> int:
+        return len(self.functions)
+
+    @staticmethod
+    def __to_csr(lists: List[List[int]]) -> Tuple[Tuple[int, ...], Tuple[int, ...]]:
+        offsets = [0]
+        flat = []
+        for targets in lists:
+            flat.extend(sorted(targets))
+            offsets.append(len(flat))
+        return (tuple(offsets), tuple(flat))
+
+    def successors(self, i: int) -> Tuple[int, ...]:
+        return self.succ[self.succ_offsets[i]:self.succ_offsets[i + 1]]
+
+    def predecessors(self, i: int) -> Tuple[int, ...]:
+        return self.pred[self.pred_offsets[i]:self.pred_offsets[i + 1]]
+
+    def sources(self) -> List[int]:
+        return [i for i in self.order if self.in_degree[i] == 0]
+
+    def critical_path_length(self, resource_name: str) -> int:
+        """Length of the whole DAG's critical path if every function ran on `resource_name`."""
+        return max(self.critical_path[resource_name], default=0)
+
+
+class DagExecution:
+    """
+    Execution state of a single invocation of a sealed DAG.
+    Shares the DAG and its topological order and only tracks its own position, so invocations don't need a
+    copy of the DAG. Anything else (e.g. `name`, `slo`, `functions`) is looked up on the DAG itself.
+
+    There are two ways of walking the DAG. `next_function` hands out functions one at a time in topological
+    order. The ready-set methods (`ready_functions`, `start_function`, `complete_function`) instead release every
+    function whose predecessors have all completed, so independent branches can run at the same time.
+    The ready-set state is only allocated once it is first used.
+    """
+    __slots__ = ('dag', 'input', '_order', '_pos', '_compiled', '_waiting_on', '_ready', '_remaining')
+    dag: Dag
+    input: Any                             # The invocation's input, e.g. for input-size-aware runtimes
+    _order: Tuple[Function, ...]
+    _pos: int
+    _compiled: CompiledDag
+    _waiting_on: Optional[List[int]]       # Number of unfinished predecessors of each function
+    _ready: Optional[Dict[int, Function]]  # Released functions that haven't started yet, in release order
+    _remaining: int                        # Functions that haven't completed yet
+
+    def __init__(self, _dag: Dag, _input: Any = None):
+        assert _dag.sealed, "Executions can only be created for sealed DAGs."
+        self.dag = _dag
+        self.input = _input
+        self._compiled = _dag.compile()
+        self._order = self._compiled.functions
+        self._pos = 0
+        self._waiting_on = None
+        self._ready = None
+        self._remaining = len(self._order)
+
+    def __getattr__(self, item):
+        if item in DagExecution.__slots__:
+            # Slots that haven't been set yet, e.g. while unpickling
+            raise AttributeError(item)
+        return getattr(self.dag, item)
+
+    def __contains__(self, index: str) -> bool:
+        return index in self.dag
+
+    def __getitem__(self, index: str) -> Function:
+        return self.dag[index]
+
+    def execute(self):
+        self._pos = 0
+
+    def next_function(self) -> Optional[Function]:
+        if self.has_next_function():
+            self._pos += 1
+            return self._order[self._pos - 1]
+        else:
+            return None
+
+    def has_next_function(self) -> bool:
+        return self._pos < len(self._order)
+
+    def peek_next_function(self) -> Optional[Function]:
+        if self.has_next_function():
+            return self._order[self._pos]
+        else:
+            return None
+
+    def __init_ready_set(self):
+        compiled = self._compiled
+        self._waiting_on = list(compiled.in_degree)
+        self._ready = {i: compiled.functions[i] for i in compiled.sources()}
+
+    def ready_functions(self) -> List[Function]:
+        """Functions whose predecessors have all completed but that haven't been started yet."""
+        if self._ready is None:
+            self.__init_ready_set()
+        return list(self._ready.values())
 
+    def start_function(self, fun: Function):
+        """Mark a ready function as placed, so it is no longer handed out by `ready_functions`."""
+        if self._ready is None:
+            self.__init_ready_set()
+        i = self._compiled.index[fun.unique_id]
+        assert i in self._ready, f"Function {fun.unique_id} is not ready to start."
+        del self._ready[i]
 
+    def complete_function(self, fid: str) -> List[Function]:
+        """Mark a started function as finished, returning the functions this releases. Costs O(out-degree)."""
+        compiled = self._compiled
+        i = compiled.index[fid]
+        assert self._ready is not None and i not in self._ready and self._waiting_on[i] == 0, \
+            f"Function {fid} has to be started before it can complete."
+        self._waiting_on[i] = -1  # Guards against completing the same function twice
+        self._remaining -= 1
+        released = []
+        for j in compiled.successors(i):
+            self._waiting_on[j] -= 1
+            if self._waiting_on[j] == 0:
+                self._ready[j] = compiled.functions[j]
+                released.append(compiled.functions[j])
+        return released
 
+    def is_finished(self) -> bool:
+        """Whether every function of this invocation has completed."""
+        return self._remaining == 0
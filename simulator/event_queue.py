@@ -1,7 +1,7 @@
 from collections import deque
-from copy import deepcopy
+from heapq import heappop, heappush
 from itertools import groupby
-from typing import Deque, List, Tuple, Optional, Set, Any
+from typing import Deque, List, Tuple, Optional, Set, Any, Iterable, Iterator
 
 from .dag import Dag
 
@@ -19,7 +19,7 @@ class EventQueue:
         all_invocations = []
         for (dag, invoc_input) in dags:
             for (t, input) in invoc_input:
-                all_invocations.append((t, deepcopy(dag), input))
+                all_invocations.append((t, dag.new_execution(input), input))
 
         # Sort, process, and add elements to queue
         sorted_invocations = sorted(all_invocations, key=lambda t: t[0])
@@ -27,6 +27,7 @@ class EventQueue:
         for time, group in groupby(sorted_invocations, lambda t: t[0]):
             events = set(map(lambda t: (t[1], t[2]), group))
             self._queue.append((events, time, time - last_time))
+            last_time = time
 
     def get_next_event(self) -> Optional[Tuple[Set, int, int]]:
         """
@@ -42,3 +43,75 @@ class EventQueue:
     def has_more_events(self) -> bool:
         """Check for any events left."""
         return len(self._queue) > 0
+
+
+class StreamingEventQueue(EventQueue):
+    """
+    An event queue that lazily merges per-DAG streams of invocations instead of materializing them all up front.
+    Memory stays proportional to the number of DAGs rather than the number of invocations.
+    """
+    _heap: List[Tuple[int, int, Any, Dag, Iterator[Tuple[int, Any]]]]
+    _last_time: int
+
+    def __init__(self, dags: List[Tuple[Dag, Iterable[Tuple[int, Any]]]]):
+        """Initialize from a list of DAGs, each with an iterable of (time, input) already sorted by time."""
+        self._heap = []
+        self._last_time = 0  # 0ms
+        for (i, (dag, invoc_input)) in enumerate(dags):
+            self.__push_next(i, dag, iter(invoc_input))
+
+    def __push_next(self, i: int, dag: Dag, invocations: Iterator[Tuple[int, Any]], prev_time: int = 0):
+        nxt = next(invocations, None)
+        if nxt is not None:
+            (t, input) = nxt
+            assert t >= prev_time, f"Invocations for DAG {dag.name} must be sorted by time."
+            # The index breaks ties so DAGs and inputs never need to be comparable
+            heappush(self._heap, (t, i, input, dag, invocations))
+
+    def get_next_event(self) -> Optional[Tuple[Set, int, int]]:
+        if not self.has_more_events():
+            return None
+        time = self._heap[0][0]
+        events = set()
+        while self._heap and self._heap[0][0] == time:
+            (t, i, input, dag, invocations) = heappop(self._heap)
+            events.add((dag.new_execution(input), input))
+            self.__push_next(i, dag, invocations, t)
+        elapsed = time - self._last_time
+        self._last_time = time
+        return (events, time, elapsed)
+
+    def has_more_events(self) -> bool:
+        return len(self._heap) > 0
+
+
+class InvocationStreamQueue(EventQueue):
+    """
+    An event queue fed by a single stream of (time, DAG, input) already sorted by time, such as a trace replay.
+    Only the next invocation is held in memory.
+    """
+    _invocations: Iterator[Tuple[int, Dag, Any]]
+    _next: Optional[Tuple[int, Dag, Any]]
+    _last_time: int
+
+    def __init__(self, invocations: Iterable[Tuple[int, Dag, Any]]):
+        self._invocations = iter(invocations)
+        self._next = next(self._invocations, None)
+        self._last_time = 0  # 0ms
+
+    def get_next_event(self) -> Optional[Tuple[Set, int, int]]:
+        if not self.has_more_events():
+            return None
+        time = self._next[0]
+        events = set()
+        while self._next is not None and self._next[0] == time:
+            (_, dag, input) = self._next
+            events.add((dag.new_execution(input), input))
+            self._next = next(self._invocations, None)
+            assert self._next is None or self._next[0] >= time, "Invocations must be sorted by time."
+        elapsed = time - self._last_time
+        self._last_time = time
+        return (events, time, elapsed)
+
+    def has_more_events(self) -> bool:
+        return self._next is not None
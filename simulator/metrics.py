@@ -0,0 +1,181 @@
+import sys
+from typing import Dict, List, Optional, Tuple
+
+from .dag import DagExecution
+
+LATENCY_PERCENTILES = (50, 99, 99.9)
+
+
+class LatencyHistogram:
+    """
+    Fixed-memory histogram of non-negative integer values, in the style of an HDR histogram.
+    Values below 2**precision_bits get a bucket each. Above that, every power of two is split into
+    2**(precision_bits - 1) equal buckets, so a percentile is off by at most 2**-(precision_bits - 1)
+    of its value (0.8% by default). Any int64 value fits; the default uses about 8k counters.
+    """
+    __slots__ = ('precision_bits', 'counts', 'count', 'total', 'min', 'max', '_sub', '_half')
+    precision_bits: int
+    counts: List[int]
+    count: int
+    total: int
+    min: int  # sys.maxsize while empty
+    max: int  # -1 while empty
+
+    def __init__(self, precision_bits: int = 8):
+        assert precision_bits >= 2, "Need at least 2 bits of precision."
+        self.precision_bits = precision_bits
+        self._sub = 1 << precision_bits
+        self._half = self._sub >> 1
+        self.counts = [0] * (self._sub + 64 * self._half)
+        self.count = 0
+        self.total = 0
+        self.min = sys.maxsize
+        self.max = -1
+
+    def __len__(self) -> int:
+        return self.count
+
+    def index(self, value: int) -> int:
+        if value < self._sub:
+            return value
+        shift = value.bit_length() - self.precision_bits
+        return self._sub + (shift - 1) * self._half + (value >> shift) - self._half
+
+    def bucket_bounds(self, index: int) -> Tuple[int, int]:
+        """Lowest value in a bucket and the lowest value of the next one."""
+        if index < self._sub:
+            return (index, index + 1)
+        (shift, top) = divmod(index - self._sub, self._half)
+        shift += 1
+        top += self._half
+        return (top << shift, (top + 1) << shift)
+
+    def record(self, value: int):
+        assert value >= 0, "Can only record non-negative values."
+        if value < self._sub:
+            self.counts[value] += 1
+        else:
+            # index(), inlined since this is called for every completed request
+            shift = value.bit_length() - self.precision_bits
+            self.counts[self._sub + (shift - 1) * self._half + (value >> shift) - self._half] += 1
+        self.count += 1
+        self.total += value
+        if value > self.max:
+            self.max = value
+        if value < self.min:
+            self.min = value
+
+    def merge(self, other: 'LatencyHistogram'):
+        assert other.precision_bits == self.precision_bits, "Can only merge histograms with the same precision."
+        for i, c in enumerate(other.counts):
+            if c:
+                self.counts[i] += c
+        self.count += other.count
+        self.total += other.total
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+
+    def mean(self) -> float:
+        return self.total / self.count if self.count else 0.0
+
+    def value_at_percentile(self, p: float) -> float:
+        """Smallest recorded value that at least p% of values are at or below, to the histogram's precision."""
+        if self.count == 0:
+            return 0.0
+        rank = max(1, -(-self.count * p // 100))  # ceil(count * p / 100)
+        seen = 0
+        for i, c in enumerate(self.counts):
+            seen += c
+            if seen >= rank:
+                (low, high) = self.bucket_bounds(i)
+                # The middle of the bucket, but never outside what was actually recorded
+                return min(max((low + high - 1) / 2, self.min), self.max)
+        return float(self.max)
+
+
+class MetricsCollector:
+    """
+    Records the life of every request in a System: arrival, each function's start and finish, and completion.
+    Request latencies (completion - arrival) go into fixed-memory histograms, overall and per DAG name, and
+    completions later than their DAG's `slo` are counted per DAG name. Only requests and functions in flight are
+    remembered, so memory does not grow with the length of the run.
+    With record_events, every event is also appended to `events` as (time, kind, tag, function id or None),
+    which does grow with the run.
+
+    Each recorded event is a few dict and attribute updates, at most about ten empty Python calls' worth:
+    benchmarks/metrics_overhead.py measures about 1.5us per event (~15% of a toy SimpleSystem run) on a machine
+    where an empty call takes 150ns. Pass collect_metrics=False to System to turn it off entirely.
+    """
+    latency_by_dag: Dict[str, LatencyHistogram]
+    completed: Dict[str, int]       # DAG name -> completed requests
+    slo_violations: Dict[str, int]  # DAG name -> requests that finished later than the DAG's slo
+    functions_started: int
+    functions_finished: int
+    events: Optional[List[Tuple[int, str, str, Optional[str]]]]
+    _arrivals: Dict[str, int]       # Tag -> arrival time of requests in flight
+
+    def __init__(self, precision_bits: int = 8, record_events: bool = False):
+        self.precision_bits = precision_bits
+        self.latency_by_dag = {}
+        self.completed = {}
+        self.slo_violations = {}
+        self.functions_started = 0
+        self.functions_finished = 0
+        self.events = [] if record_events else None
+        self._arrivals = {}
+
+    def on_arrival(self, tag: str, time: int):
+        assert tag not in self._arrivals, f"Request {tag} already arrived."
+        self._arrivals[tag] = time
+        if self.events is not None:
+            self.events.append((time, 'arrival', tag, None))
+
+    def on_function_start(self, tag: str, fid: str, time: int):
+        self.functions_started += 1
+        if self.events is not None:
+            self.events.append((time, 'start', tag, fid))
+
+    def on_function_finish(self, tag: str, fid: str, time: int):
+        self.functions_finished += 1
+        if self.events is not None:
+            self.events.append((time, 'finish', tag, fid))
+
+    def on_completion(self, tag: str, dag: DagExecution, time: int):
+        latency = time - self._arrivals.pop(tag)
+        if isinstance(dag, DagExecution):
+            dag = dag.dag  # Reading name and slo through the execution would go through its slow __getattr__
+        name = dag.name
+        by_dag = self.latency_by_dag.get(name)
+        if by_dag is None:
+            by_dag = self.latency_by_dag[name] = LatencyHistogram(self.precision_bits)
+            self.completed[name] = 0
+            self.slo_violations[name] = 0
+        by_dag.record(latency)
+        self.completed[name] += 1
+        slo = dag.slo
+        if slo is not None and latency > slo:
+            self.slo_violations[name] += 1
+        if self.events is not None:
+            self.events.append((time, 'completion', tag, None))
+
+    def in_flight(self) -> int:
+        return len(self._arrivals)
+
+    def latency(self) -> LatencyHistogram:
+        """Latencies of every completed request, merged from the per-DAG histograms when asked for."""
+        merged = LatencyHistogram(self.precision_bits)
+        for by_dag in self.latency_by_dag.values():
+            merged.merge(by_dag)
+        return merged
+
+    def summary(self) -> Dict[str, float]:
+        """Completed requests, mean and LATENCY_PERCENTILES latency, and SLO violations across every DAG."""
+        latency = self.latency()
+        summary = {
+            'completed': latency.count,
+            'slo_violations': sum(self.slo_violations.values()),
+            'mean_latency': latency.mean(),
+        }
+        for p in LATENCY_PERCENTILES:
+            summary[f'p{p}_latency'] = latency.value_at_percentile(p)
+        return summary
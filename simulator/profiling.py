@@ -0,0 +1,139 @@
+import marshal
+from time import perf_counter_ns
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+# Phases of a System, in the order they happen
+PHASES = ('run', 'ingest', 'schedule', 'completions', 'admit', 'find_resource', 'place', 'finish')
+
+Path = Tuple[str, ...]  # A phase and the phases it ran inside, outermost first
+
+
+class Profiler:
+    """
+    Wall-clock phase timers, counters and hooks for a System, attached with `System.enable_profiling`.
+    Each phase is timed along its path of enclosing phases (e.g. run;schedule;place), so the results can be
+    written out as folded stacks for flame graphs (`write_folded`) or as a cProfile dump (`dump_stats`).
+    Counters:
+    - decisions: functions placed with `place_function`
+    - failed_placements: resource lookups that found no resource with room
+    - rejected_placements: `place_function` calls where the function didn't fit
+    """
+    totals: Dict[Path, int]  # Nanoseconds spent in each path, including the phases inside it
+    calls: Dict[Path, int]
+    counters: Dict[str, int]
+    _before: Dict[str, List[Callable[[str], Any]]]
+    _after: Dict[str, List[Callable[[str, int], Any]]]
+    _stack: List[str]
+
+    def __init__(self):
+        self.totals = {}
+        self.calls = {}
+        self.counters = {'decisions': 0, 'failed_placements': 0, 'rejected_placements': 0}
+        self._before = {}
+        self._after = {}
+        self._stack = []
+
+    def add_hook(self, phase: str, before: Optional[Callable[[str], Any]] = None,
+                 after: Optional[Callable[[str, int], Any]] = None):
+        """Call `before(phase)` as a phase starts and `after(phase, elapsed_ns)` once it ends."""
+        assert phase in PHASES, f"Unknown phase {phase}, expected one of {PHASES}"
+        if before is not None:
+            self._before.setdefault(phase, []).append(before)
+        if after is not None:
+            self._after.setdefault(phase, []).append(after)
+
+    def count(self, counter: str, n: int = 1):
+        self.counters[counter] = self.counters.get(counter, 0) + n
+
+    def wrap(self, phase: str, fn: Callable, outcome: Optional[Callable[['Profiler', Any], Any]] = None) -> Callable:
+        """`fn`, timed as `phase`. `outcome(profiler, result)` can update counters from what it returned."""
+        stack = self._stack
+        totals = self.totals
+        calls = self.calls
+        before = self._before.setdefault(phase, [])
+        after = self._after.setdefault(phase, [])
+
+        def timed(*args, **kwargs):
+            for hook in before:
+                hook(phase)
+            stack.append(phase)
+            path = tuple(stack)
+            start = perf_counter_ns()
+            try:
+                result = fn(*args, **kwargs)
+            finally:
+                elapsed = perf_counter_ns() - start
+                stack.pop()
+                totals[path] = totals.get(path, 0) + elapsed
+                calls[path] = calls.get(path, 0) + 1
+            if outcome is not None:
+                outcome(self, result)
+            for hook in after:
+                hook(phase, elapsed)
+            return result
+
+        timed.__wrapped__ = fn
+        return timed
+
+    def self_times(self) -> Dict[Path, int]:
+        """Nanoseconds spent in each path outside the phases inside it."""
+        own = dict(self.totals)
+        for path, total in self.totals.items():
+            if len(path) > 1 and path[:-1] in own:
+                own[path[:-1]] -= total
+        return own
+
+    def phase_times(self) -> Dict[str, Tuple[int, float, float]]:
+        """Calls, inclusive seconds and self seconds of each phase, over every path it appears in."""
+        own = self.self_times()
+        times = {}
+        for path, total in self.totals.items():
+            (calls, inclusive, exclusive) = times.get(path[-1], (0, 0.0, 0.0))
+            if path[-1] in path[:-1]:
+                total = 0  # Already counted in the enclosing call of the same phase
+            times[path[-1]] = (calls + self.calls[path], inclusive + total / 1e9, exclusive + own[path] / 1e9)
+        return times
+
+    def report(self) -> str:
+        times = self.phase_times()
+        run_time = times.get('run', (0, 0.0, 0.0))[1] or sum(t[2] for t in times.values())
+        lines = [f"{'phase':>19} {'calls':>10} {'total (s)':>10} {'self (s)':>10} {'self %':>7}"]
+        for phase in sorted(times, key=lambda p: -times[p][2]):
+            (calls, inclusive, exclusive) = times[phase]
+            share = exclusive / run_time if run_time > 0 else 0.0
+            lines.append(f"{phase:>19} {calls:>10} {inclusive:>10.3f} {exclusive:>10.3f} {share:>7.1%}")
+        lines.extend(f"{counter:>19} {value:>10}" for counter, value in self.counters.items())
+        return '\n'.join(lines)
+
+    def folded(self) -> str:
+        """Self time of each path in microseconds, one `run;schedule;place 1234` line each, for flamegraph.pl."""
+        own = self.self_times()
+        return '\n'.join(f"{';'.join(path)} {own[path] // 1000}" for path in sorted(own)) + '\n'
+
+    def write_folded(self, path: str):
+        with open(path, 'w') as f:
+            f.write(self.folded())
+
+    def pstats_dict(self) -> Dict[Tuple[str, int, str], Tuple[int, int, float, float, Dict]]:
+        """The phases in the format cProfile dumps, with each phase as a function called by its enclosing phase."""
+        def key(phase):
+            return ('simulator', PHASES.index(phase) if phase in PHASES else 0, phase)
+
+        own = self.self_times()
+        stats = {}
+        for path, total in self.totals.items():
+            phase = key(path[-1])
+            (cc, nc, tt, ct, callers) = stats.get(phase, (0, 0, 0.0, 0.0, {}))
+            n = self.calls[path]
+            inclusive = 0.0 if path[-1] in path[:-1] else total / 1e9
+            stats[phase] = (cc + n, nc + n, tt + own[path] / 1e9, ct + inclusive, callers)
+            if len(path) > 1:
+                caller = key(path[-2])
+                (ccc, cnc, ctt, cct) = callers.get(caller, (0, 0, 0.0, 0.0))
+                callers[caller] = (ccc + n, cnc + n, ctt + own[path] / 1e9, cct + total / 1e9)
+        return stats
+
+    def dump_stats(self, path: str):
+        """Write a file that `pstats.Stats(path)` and cProfile viewers (e.g. snakeviz) can read."""
+        with open(path, 'wb') as f:
+            marshal.dump(self.pstats_dict(), f)
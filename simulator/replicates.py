@@ -0,0 +1,124 @@
+import math
+import multiprocessing
+import random
+from dataclasses import dataclass, field
+from time import perf_counter
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from .system import System
+
+# Two-sided 95% critical values of Student's t distribution, by degrees of freedom
+T_95 = {1: 12.706, 2: 4.303, 3: 3.182, 4: 2.776, 5: 2.571, 6: 2.447, 7: 2.365, 8: 2.306, 9: 2.262, 10: 2.228,
+        12: 2.179, 15: 2.131, 20: 2.086, 25: 2.060, 30: 2.042, 40: 2.021, 60: 2.000, 120: 1.980, 1000: 1.962}
+
+# What a worker needs to run replicates, set by its initializer. Fork start-up inherits these without pickling,
+# so factories can be lambdas or closures.
+_worker_setup: Optional[Tuple[Callable[..., System], Any, Callable[[System, int], Dict[str, float]], bool]] = None
+
+
+@dataclass
+class Replicate:
+    """Summary of one simulation run, for one seed at one parameter point."""
+    index: int
+    seed: int
+    params: Dict[str, Any]
+    summary: Dict[str, float]  # Metric name -> value, e.g. end time or a latency percentile
+    elapsed: float             # Wall clock seconds the run took
+
+
+@dataclass
+class MetricStats:
+    """A metric across the replicates of one parameter point."""
+    n: int
+    mean: float
+    ci_low: float   # 95% confidence interval of the mean
+    ci_high: float
+    percentiles: Dict[float, float] = field(default_factory=dict)
+
+
+def end_time_summary(system: System, end_time: int) -> Dict[str, float]:
+    return {'end_time': end_time}
+
+
+def latency_summary(system: System, end_time: int) -> Dict[str, float]:
+    """The end time and the summary of the system's metrics collector."""
+    return {'end_time': end_time, **system.metrics.summary()}
+
+
+def _init_worker(factory, workload, summarize, event_driven):
+    global _worker_setup
+    _worker_setup = (factory, workload, summarize, event_driven)
+
+
+def _run_replicate(task: Tuple[int, int, Dict[str, Any]]) -> Replicate:
+    (index, seed, params) = task
+    (factory, workload, summarize, event_driven) = _worker_setup
+    random.seed(seed)
+    start = perf_counter()
+    system = factory(workload, seed, **params)
+    end_time = system.run_event_driven() if event_driven else system.run()
+    return Replicate(index, seed, params, summarize(system, end_time), perf_counter() - start)
+
+
+def run_replicates(factory: Callable[..., System], workload: Any, seeds: Iterable[int],
+                   points: Iterable[Dict[str, Any]] = ({},),
+                   summarize: Callable[[System, int], Dict[str, float]] = end_time_summary,
+                   processes: Optional[int] = None, event_driven: bool = True) -> Iterator[Replicate]:
+    """
+    Run `factory(workload, seed, **params)` for every seed at every parameter point, each on its own System,
+    over a pool of `processes` workers (every core if None). `summarize(system, end_time)` turns a finished
+    run into its metrics. Replicates are yielded as they finish, not in order; `index` gives their order.
+    Everything a replicate needs should come from the workload, seed and params, so that it is reproducible.
+    """
+    seeds = list(seeds)
+    tasks = [(i, seed, dict(params)) for i, (params, seed) in enumerate((p, s) for p in points for s in seeds)]
+    setup = (factory, workload, summarize, event_driven)
+    if processes == 1:
+        _init_worker(*setup)
+        for task in tasks:
+            yield _run_replicate(task)
+        return
+
+    # Fork is the cheapest way to start workers, and the only one that doesn't pickle the factory
+    methods = multiprocessing.get_all_start_methods()
+    context = multiprocessing.get_context('fork' if 'fork' in methods else None)
+    with context.Pool(processes, initializer=_init_worker, initargs=setup) as pool:
+        yield from pool.imap_unordered(_run_replicate, tasks)
+
+
+def percentile(sorted_values: List[float], p: float) -> float:
+    """The p-th percentile (0 to 100) of sorted values, interpolating linearly between them."""
+    if len(sorted_values) == 1:
+        return sorted_values[0]
+    rank = p / 100 * (len(sorted_values) - 1)
+    low = math.floor(rank)
+    high = min(low + 1, len(sorted_values) - 1)
+    return sorted_values[low] + (sorted_values[high] - sorted_values[low]) * (rank - low)
+
+
+def metric_stats(values: List[float], percentiles: Iterable[float] = (50, 90, 99)) -> MetricStats:
+    n = len(values)
+    mean = sum(values) / n
+    if n > 1:
+        std = math.sqrt(sum((v - mean) ** 2 for v in values) / (n - 1))
+        critical = T_95[max(df for df in T_95 if df <= n - 1)]  # Rounding df down keeps the interval conservative
+        half_width = critical * std / math.sqrt(n)
+    else:
+        half_width = math.inf
+    ordered = sorted(values)
+    return MetricStats(n, mean, mean - half_width, mean + half_width, {p: percentile(ordered, p) for p in percentiles})
+
+
+def aggregate(replicates: Iterable[Replicate],
+              percentiles: Iterable[float] = (50, 90, 99)) -> Dict[Tuple, Dict[str, MetricStats]]:
+    """
+    Stats of every metric across the replicates of each parameter point.
+    Points are keyed by their sorted (name, value) pairs, e.g. () when there are no parameters.
+    """
+    values: Dict[Tuple, Dict[str, List[float]]] = {}
+    for replicate in replicates:
+        point = values.setdefault(tuple(sorted(replicate.params.items())), {})
+        for metric, value in replicate.summary.items():
+            point.setdefault(metric, []).append(value)
+    return {key: {metric: metric_stats(vals, percentiles) for metric, vals in metrics.items()}
+            for key, metrics in values.items()}
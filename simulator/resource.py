@@ -1,8 +1,11 @@
 from enum import Enum
+from heapq import heapify, heappop, heappush
 from typing import Dict, Tuple, List, Optional
 
 import sys
 
+from .capacity_index import CapacityIndex
+from .completion_calendar import CompletionCalendar
 from .dag import Function
 from .runtime import Runtime
 
@@ -12,6 +15,13 @@ class ResourceType(Enum):
     GPU = 2
 
 
+class Placement(Enum):
+    """Policies for picking a resource in a pool that has room for a function."""
+    FIRST_FIT = 1  # Earliest resource in the pool with enough space
+    BEST_FIT = 2   # Resource with the least space left that still fits
+    WORST_FIT = 3  # Resource with the most space left
+
+
 class Resource:
     """A class representing an actual resource, e.g ARMv7_CPU"""
     name: str
@@ -19,6 +29,9 @@ class Resource:
     active: Dict[Tuple[str, str], Tuple[float, int]]
     available_space: float
     nearest_finish: int
+    calendar: Optional[CompletionCalendar]    # Set by the owning System, if any
+    capacity_index: Optional[CapacityIndex]   # Set by the owning ResourcePool, if any
+    _finish_heap: List[Tuple[int, str, str]]  # (finish_time, function id, tag), may hold stale entries
 
     def __init__(self, _name: str, _typ: ResourceType):
         self.name = _name
@@ -26,17 +39,24 @@ class Resource:
         self.active = {}
         self.available_space = 100.0
         self.nearest_finish = sys.maxsize
+        self.calendar = None
+        self.capacity_index = None
+        self._finish_heap = []
 
     def add_function(self, fun: Function, tag: str, curr_time: int, *args, **kwargs) -> bool:
         needed_space = fun.resources[self.name]['space']
         if self.can_add_function(fun, tag):
             self.available_space -= needed_space
+            if self.capacity_index is not None:
+                self.capacity_index.update(self)
             rt: Runtime = fun.resources[self.name]['exec']
             finish_time = curr_time + rt.get_runtime(*args, **kwargs)
             self.active[(fun.unique_id, tag)] = (needed_space, finish_time)
+            heappush(self._finish_heap, (finish_time, fun.unique_id, tag))
+            if self.calendar is not None:
+                self.calendar.register(self, finish_time)
             if finish_time < self.nearest_finish:
                 self.nearest_finish = finish_time
-            print(self.active)
             return True
         else:
             return False
@@ -60,13 +80,21 @@ class Resource:
     def remove_function(self, fun: Function, tag: str, curr_time: int):
         fname = fun.unique_id
         self.__remove_helper(fname, tag, curr_time)
+        self.__update_nearest_finish()
 
     def remove_at_time(self, curr_time: int) -> List[Tuple[str, str]]:
         removed_functions = []
-        for k, v in self.active.copy().items():
-            if curr_time >= v[1]:
-                self.__remove_helper(k[0], k[1], curr_time)
-                removed_functions.append(k)
+        if curr_time < self.nearest_finish:
+            return removed_functions
+        heap = self._finish_heap
+        while heap and heap[0][0] <= curr_time:
+            (finish_time, fname, tag) = heappop(heap)
+            entry = self.active.get((fname, tag))
+            # Skip entries left behind by `remove_function`
+            if entry is not None and entry[1] == finish_time:
+                self.__remove_helper(fname, tag, curr_time)
+                removed_functions.append((fname, tag))
+        self.__update_nearest_finish()
         return removed_functions
 
     def __remove_helper(self, fname: str, tag: str, curr_time: int):
@@ -75,14 +103,24 @@ class Resource:
         (freed_space, finish_time) = self.active.pop((fname, tag))
         self.available_space += freed_space
         assert 0.0 <= self.available_space <= 100.0, "Avaailable space must always represent a percentage."
-        if finish_time == self.nearest_finish:
-            self.nearest_finish = self.__find_nearest_finish()
-
-    def __find_nearest_finish(self) -> int:
-        finish_times = []
-        for k, v in self.active.items():
-            finish_times.append(v[1])
-        return min(finish_times, default=-1)
+        if self.capacity_index is not None:
+            self.capacity_index.update(self)
+
+    def __update_nearest_finish(self):
+        """Drop stale entries off the top of the heap (lazy deletion) and refresh `nearest_finish`."""
+        heap = self._finish_heap
+        # Rebuild once stale entries dominate so the heap stays proportional to `active`
+        if len(heap) > 2 * len(self.active) + 16:
+            self._finish_heap = heap = [(v[1], k[0], k[1]) for k, v in self.active.items()]
+            heapify(heap)
+        while heap:
+            (finish_time, fname, tag) = heap[0]
+            entry = self.active.get((fname, tag))
+            if entry is not None and entry[1] == finish_time:
+                self.nearest_finish = finish_time
+                return
+            heappop(heap)
+        self.nearest_finish = sys.maxsize
 
 
 class ResourcePool:
@@ -90,15 +128,31 @@ class ResourcePool:
     name: str
     typ: ResourceType
     resources: Dict[str, Resource]
+    placement: Placement
+    _indexes: Dict[str, CapacityIndex]  # Resource name -> index over the resources with that name
+    _keys: Dict[int, Tuple[int, str]]   # id(resource) -> (position in the pool, key in `resources`)
 
-    def __init__(self, _name: str, _typ: ResourceType, _resources: List[Tuple[str, Resource]]=[]):
+    def __init__(self, _name: str, _typ: ResourceType, _resources: List[Tuple[str, Resource]]=[],
+                 _placement: Placement = Placement.FIRST_FIT):
         self.name = _name
         self.typ = _typ
         self.resources = {}
+        self.placement = _placement
+        self._keys = {}
+        by_name: Dict[str, List[Resource]] = {}
         for (name, r) in _resources:
             assert _typ == r.typ, "Resource types must all be the same."
             assert name not in self.resources, "Each resource must have a unique identifier"
+            assert r.capacity_index is None, "A resource can only belong to a single pool."
             self.resources[name] = r
+            self._keys[id(r)] = (len(self._keys), name)
+            by_name.setdefault(r.name, []).append(r)
+        self._indexes = {}
+        for (rname, rs) in by_name.items():
+            index = CapacityIndex(rs)
+            for r in rs:
+                r.capacity_index = index
+            self._indexes[rname] = index
 
     def __getitem__(self, item: str):
         return self.resources[item]
@@ -113,15 +167,47 @@ class ResourcePool:
     def get_all_resources(self) -> List[Resource]:
         return self.resources.values()
 
+    def __candidate_indexes(self, fun: Function) -> List[Tuple[CapacityIndex, float]]:
+        """The indexes whose resources `fun` can run on, along with the space it needs on each."""
+        candidates = []
+        for (rname, index) in self._indexes.items():
+            if rname in fun.resources:
+                info = fun.resources[rname]
+                assert 'space' in info, "Function needs to define the amount of space it needs on this resource."
+                assert 'type' in info, "Function needs to define the type of the resource it needs"
+                if info['type'] == self.typ:
+                    candidates.append((index, info['space']))
+        return candidates
+
     def find_available_resources(self, fun: Function, tag: str) -> List[Tuple[str, Resource]]:
         available = []
-        for k, v in self.resources.items():
-            if v.name in fun.resources and v.can_add_function(fun, tag):
-                available.append((k, v))
-        return available
+        for (index, needed_space) in self.__candidate_indexes(fun):
+            available.extend(self._keys[id(r)] + (r,) for r in index.all_fits(needed_space))
+        available.sort(key=lambda t: t[0])
+        return [(k, r) for (_, k, r) in available]
 
     def find_first_available_resource(self, fun: Function, tag: str) -> Optional[Tuple[str, Resource]]:
-        for k, v in self.resources.items():
-            if v.name in fun.resources and v.can_add_function(fun, tag):
-                return (k, v)
-        return None
+        return self.find_resource(fun, tag, Placement.FIRST_FIT)
+
+    def find_resource(self, fun: Function, tag: str, placement: Optional[Placement] = None) -> Optional[Tuple[str, Resource]]:
+        """Find a resource with room for `fun` using `placement`, or the pool's own policy if not given."""
+        placement = placement or self.placement
+        best = None
+        best_key = None
+        for (index, needed_space) in self.__candidate_indexes(fun):
+            if placement == Placement.FIRST_FIT:
+                r = index.first_fit(needed_space)
+                key = None if r is None else self._keys[id(r)][0]
+            elif placement == Placement.BEST_FIT:
+                r = index.best_fit(needed_space)
+                key = None if r is None else (r.available_space, self._keys[id(r)][0])
+            else:
+                r = index.worst_fit(needed_space)
+                key = None if r is None else (-r.available_space, self._keys[id(r)][0])
+            if r is not None and (best is None or key < best_key):
+                best = r
+                best_key = key
+        if best is None:
+            return None
+        assert best.can_add_function(fun, tag)
+        return (self._keys[id(best)][1], best)
@@ -1,3 +1,18 @@
+import csv
+import math
+import numbers
+from bisect import bisect_right
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+DEFAULT_BLOCK_SIZE = 4096  # Samples drawn at once by a SampledTime
+AZURE_DURATION_PERCENTILES = [0, 1, 25, 50, 75, 99, 100]  # percentile_Average_<p> columns of the Azure durations
+
+
 # Initially wanted this to be a true `interface` in the OOP sense, but I don't particularly like Python's ABC module
 class Runtime:
     """An interface to describe runtimes for DAGs and system components"""
@@ -7,6 +22,13 @@ class Runtime:
     def get_runtime(self, *args, **kwargs) -> int:
         raise NotImplementedError("`time` method should not be implemented. Implement in a subclass of runtime")
 
+    def expected_runtime(self, *args, **kwargs) -> int:
+        """
+        A typical runtime for estimates (e.g. critical paths or picking a resource), without the side effects of
+        `get_runtime`. Only deterministic runtimes can rely on this default, random ones have to override it.
+        """
+        return self.get_runtime(*args, **kwargs)
+
 
 class ConstantTime(Runtime):
     """"Constant runtime"""
@@ -15,5 +37,191 @@ class ConstantTime(Runtime):
     def __init__(self, _time: int):
         self.time =  _time
 
-    def get_runtime(self) -> int:
-        return self.time
\ No newline at end of file
+    def get_runtime(self, *args, **kwargs) -> int:
+        return self.time
+
+    def expected_runtime(self, *args, **kwargs) -> int:
+        return self.time
+
+class SampledTime(Runtime):
+    """
+    A random runtime. Samples are drawn `block_size` at a time from a seeded NumPy generator and handed out
+    one per call, so the same seed always gives the same sequence of runtimes.
+    Subclasses implement `_draw`.
+    """
+    block_size: int
+    _rng: 'np.random.Generator'
+    _buffer: List[int]
+    _pos: int
+
+    def __init__(self, seed: Optional[int] = None, block_size: int = DEFAULT_BLOCK_SIZE):
+        assert np is not None, "Sampled runtimes need NumPy."
+        self.block_size = block_size
+        self._rng = np.random.default_rng(seed)
+        self._buffer = []
+        self._pos = 0
+
+    def _draw(self, n: int) -> 'np.ndarray':
+        raise NotImplementedError("`_draw` should be implemented in a subclass of SampledTime")
+
+    def _median(self) -> float:
+        raise NotImplementedError("`_median` should be implemented in a subclass of SampledTime")
+
+    def expected_runtime(self, *args, **kwargs) -> int:
+        """The median runtime. Doesn't draw a sample, so estimates don't change the sequence `get_runtime` returns."""
+        return int(round(self._median()))
+
+    def get_runtime(self, *args, **kwargs) -> int:
+        if self._pos == len(self._buffer):
+            # A list of ints is faster to index than an array, and gives back ints rather than NumPy scalars
+            self._buffer = np.rint(self._draw(self.block_size)).astype(np.int64).tolist()
+            self._pos = 0
+        time = self._buffer[self._pos]
+        self._pos += 1
+        return time
+
+
+class LogNormalTime(SampledTime):
+    """Log-normal runtime, where the log of the runtime is normal with mean `mu` and standard deviation `sigma`"""
+    mu: float
+    sigma: float
+
+    def __init__(self, _mu: float, _sigma: float, seed: Optional[int] = None, block_size: int = DEFAULT_BLOCK_SIZE):
+        super().__init__(seed, block_size)
+        self.mu = _mu
+        self.sigma = _sigma
+
+    @classmethod
+    def from_median(cls, median: float, sigma: float, **kwargs) -> 'LogNormalTime':
+        return cls(np.log(median), sigma, **kwargs)
+
+    def _draw(self, n: int) -> 'np.ndarray':
+        return self._rng.lognormal(self.mu, self.sigma, n)
+
+    def _median(self) -> float:
+        return math.exp(self.mu)
+
+
+class QuantileTime(SampledTime):
+    """
+    Runtime with a piecewise-linear quantile function through (probabilities[i], times[i]),
+    sampled by inverse transform. probabilities must go from 0 to 1.
+    """
+    probabilities: 'np.ndarray'
+    times: 'np.ndarray'
+
+    def __init__(self, _probabilities: Sequence[float], _times: Sequence[float], seed: Optional[int] = None,
+                 block_size: int = DEFAULT_BLOCK_SIZE):
+        super().__init__(seed, block_size)
+        self.probabilities = np.asarray(_probabilities, dtype=float)
+        self.times = np.asarray(_times, dtype=float)
+        assert self.probabilities[0] == 0 and self.probabilities[-1] == 1, "Quantiles must cover 0 to 1."
+        assert np.all(np.diff(self.probabilities) >= 0) and np.all(np.diff(self.times) >= 0), "Quantiles must be sorted."
+
+    def _draw(self, n: int) -> 'np.ndarray':
+        return np.interp(self._rng.random(n), self.probabilities, self.times)
+
+    def _median(self) -> float:
+        return float(np.interp(0.5, self.probabilities, self.times))
+
+
+class EmpiricalTime(QuantileTime):
+    """Runtime following the empirical CDF of observed `samples`, interpolating between them"""
+
+    def __init__(self, samples: Sequence[float], **kwargs):
+        times = np.sort(np.asarray(samples, dtype=float))
+        super().__init__(np.linspace(0, 1, len(times)), times, **kwargs)
+
+
+class AzurePercentileTime(QuantileTime):
+    """Runtime interpolated between a function's duration percentiles, as given in the Azure Functions dataset"""
+
+    def __init__(self, percentiles: Dict[float, float], **kwargs):
+        points = sorted(percentiles.items())
+        super().__init__([p / 100 for p, _ in points], [t for _, t in points], **kwargs)
+
+    @classmethod
+    def from_duration_row(cls, row, **kwargs) -> 'AzurePercentileTime':
+        """From a row of function_durations_percentiles.anon.d<day>.csv"""
+        return cls({p: row[f'percentile_Average_{p}'] for p in AZURE_DURATION_PERCENTILES}, **kwargs)
+
+
+def input_size(input: Any) -> Optional[float]:
+    """
+    Size of an invocation input: the input itself if it is a number, otherwise its `size` key or attribute,
+    otherwise its length. None if it has none of those.
+    """
+    if input is None or isinstance(input, bool) or (np is not None and isinstance(input, np.bool_)):
+        return None
+    # numbers.Real covers NumPy scalars too, which would otherwise fall through to their `size` of 1
+    if isinstance(input, numbers.Real):
+        return input
+    if np is not None and isinstance(input, np.ndarray) and input.ndim == 0:
+        return input.item()
+    if isinstance(input, dict):
+        return input.get('size')
+    size = getattr(input, 'size', None)
+    if size is not None:
+        return size
+    if hasattr(input, '__len__'):
+        return len(input)
+    return None
+
+
+class InputSizeTime(Runtime):
+    """
+    Runtime that depends on the size of the invocation input (payload size, batch size, ...), interpolated
+    piecewise-linearly between profiled (size, time) points and extrapolated along the first and last segments.
+
+    Sizes are grouped into logarithmic buckets, `buckets_per_doubling` of them per doubling of size, and the
+    runtime of a bucket is only interpolated the first time it is asked for. There is one InputSizeTime per
+    function and resource, so lookups are memoized per (function, resource, size bucket).
+    An input without a size runs as the smallest profiled size.
+    """
+    sizes: List[float]
+    times: List[float]
+    buckets_per_doubling: int
+    size_of: Callable[[Any], Optional[float]]
+    _memo: Dict[int, int]  # Size bucket -> runtime
+
+    def __init__(self, _table: Sequence[Tuple[float, float]], buckets_per_doubling: int = 8,
+                 size_of: Callable[[Any], Optional[float]] = input_size):
+        assert len(_table) > 0, "Need at least one profiled size."
+        points = sorted(_table)
+        self.sizes = [size for size, _ in points]
+        self.times = [time for _, time in points]
+        assert all(size >= 0 for size in self.sizes), "Sizes can't be negative."
+        self.buckets_per_doubling = buckets_per_doubling
+        self.size_of = size_of
+        self._memo = {}
+
+    @classmethod
+    def from_csv(cls, path: str, size_column: str = 'size', time_column: str = 'time', **kwargs) -> 'InputSizeTime':
+        """From a profiling CSV with one (size, time) measurement per row"""
+        with open(path, newline='') as f:
+            table = [(float(row[size_column]), float(row[time_column])) for row in csv.DictReader(f)]
+        return cls(table, **kwargs)
+
+    def bucket(self, size: float) -> int:
+        return int(math.log2(size + 1) * self.buckets_per_doubling)
+
+    def bucket_size(self, bucket: int) -> float:
+        """The size a bucket's runtime is interpolated at, the geometric middle of the bucket"""
+        return 2 ** ((bucket + 0.5) / self.buckets_per_doubling) - 1
+
+    def interpolate(self, size: float) -> float:
+        if len(self.sizes) == 1:
+            return self.times[0]
+        i = min(max(bisect_right(self.sizes, size), 1), len(self.sizes) - 1)
+        (x0, x1, y0, y1) = (self.sizes[i - 1], self.sizes[i], self.times[i - 1], self.times[i])
+        if x1 == x0:
+            return y1
+        return max(y0 + (y1 - y0) * (size - x0) / (x1 - x0), 0.0)
+
+    def get_runtime(self, input: Any = None, *args, **kwargs) -> int:
+        size = self.size_of(input)
+        b = self.bucket(self.sizes[0] if size is None else max(size, 0))
+        time = self._memo.get(b)
+        if time is None:
+            time = self._memo[b] = int(round(self.interpolate(self.bucket_size(b))))
+        return time
@@ -1,31 +1,143 @@
-from typing import Dict, Tuple
+import sys
+from typing import Dict, List, Optional, Tuple
 
-from .dag import Dag
+from .completion_calendar import CompletionCalendar
+from .dag import DagExecution, Function
 from .event_queue import EventQueue
-from .resource import ResourcePool
+from .metrics import MetricsCollector
+from .profiling import Profiler
+from .resource import Resource, ResourcePool
 
 # TODO: Need to adjust this interface after writing a couple of examples
 class System:
-    """Abstract system implementation. Subclass and customize behavior based on what you'd like."""
+    """
+    Abstract system implementation. Subclass and customize behavior based on what you'd like.
+    Each request is tracked by tag in `outstanding_requests`. On every call to `schedule` a subclass should free
+    completed functions (`remove_completed`) and report them to their request (`DagExecution.complete_function`),
+    then try to place any of the request's `ready_functions`, marking each placed one with `start_function`.
+    Requests are removed once `is_finished` and the simulation ends when none are left.
+    Using `add_request`, `place_function` and `finish_request` for those steps keeps `metrics` up to date.
+    """
     events: EventQueue
     pools: Dict[str, ResourcePool]
-    outstanding_requests: Dict[str, Tuple[bool, Dag]]  # The boolean flag indicates whether or not the next function can be scheduled
+    outstanding_requests: Dict[str, DagExecution]  # Its ready functions can all be placed in the same step
     time: int
+    calendar: CompletionCalendar  # Finish times of every running function, across all pools
+    metrics: Optional[MetricsCollector]
+    profiler: Optional[Profiler]  # Set while profiling is enabled
 
-    def __init__(self, _events: EventQueue, _pools: Dict[str, ResourcePool], *args, **kwargs):
+    def __init__(self, _events: EventQueue, _pools: Dict[str, ResourcePool], *args,
+                 metrics: Optional[MetricsCollector] = None, collect_metrics: bool = True, **kwargs):
         self.events = _events
         self.pools = _pools
         self.outstanding_requests = {}
         self.time = 0
+        self.calendar = CompletionCalendar()
+        if metrics is None and collect_metrics:
+            metrics = MetricsCollector()
+        self.metrics = metrics
+        self.profiler = None
+        for pool in self.pools.values():
+            for resource in pool.get_all_resources():
+                assert resource.calendar is None, "A resource can only belong to a single system."
+                resource.calendar = self.calendar
 
     def schedule(self, curr_time, events, *args, **kwargs):
         raise NotImplementedError("Create a subclass and implement your secheduler in this function.")
 
+    def remove_completed(self, curr_time: int) -> List[Tuple[Resource, str, str]]:
+        """
+        Free every function that has finished by `curr_time`, returning (resource, function id, tag) for each.
+        Only resources with a completion in the calendar are visited, so this is cheap when nothing finishes.
+        """
+        completed = []
+        for resource in self.calendar.pop_due(curr_time):
+            for (fid, tag) in resource.remove_at_time(curr_time):
+                completed.append((resource, fid, tag))
+        if self.metrics is not None:
+            for (_, fid, tag) in completed:
+                self.metrics.on_function_finish(tag, fid, curr_time)
+        return completed
+
+    def add_request(self, tag: str, dag: DagExecution, curr_time: int):
+        """Start tracking a newly arrived request."""
+        assert tag not in self.outstanding_requests, f"Tag {tag} is already in use."
+        self.outstanding_requests[tag] = dag
+        if self.metrics is not None:
+            self.metrics.on_arrival(tag, curr_time)
+
+    def place_function(self, resource: Resource, fun: Function, tag: str, curr_time: int, *args, **kwargs) -> bool:
+        """
+        Run a ready function of request `tag` on `resource` and mark it started.
+        Returns False, changing nothing, if the function doesn't fit.
+        """
+        if not resource.add_function(fun, tag, curr_time, *args, **kwargs):
+            return False
+        self.outstanding_requests[tag].start_function(fun)
+        if self.metrics is not None:
+            self.metrics.on_function_start(tag, fun.unique_id, curr_time)
+        return True
+
+    def finish_request(self, tag: str, curr_time: int) -> DagExecution:
+        """Stop tracking a request whose functions have all completed."""
+        dag = self.outstanding_requests.pop(tag)
+        if self.metrics is not None:
+            self.metrics.on_completion(tag, dag, curr_time)
+        return dag
+
+    def next_wakeup_time(self) -> int:
+        """
+        Earliest time at which the scheduler needs to run again, ignoring arrivals.
+        Defaults to the nearest function completion across all pools, or sys.maxsize if nothing is running.
+        Override this if your scheduler has timers of its own (e.g. delayed placement).
+        """
+        return self.calendar.peek()
+
+    def enable_profiling(self, profiler: Optional[Profiler] = None) -> Profiler:
+        """
+        Time each phase of the simulation and count placement decisions, whatever the scheduler.
+        The phases' methods are replaced by timed versions on this instance (and its event queue and pools), so
+        nothing is timed or even checked until this is called, and `disable_profiling` puts the originals back.
+        Phases: run, ingest (`get_next_event`), schedule, completions (`remove_completed`), admit (`add_request`),
+        find_resource (resource lookups in the pools), place (`place_function`) and finish (`finish_request`).
+        """
+        assert self.profiler is None, "Profiling is already enabled."
+        self.profiler = profiler = profiler or Profiler()
+        for (phase, name) in [('run', 'run'), ('run', 'run_event_driven'), ('schedule', 'schedule'),
+                              ('completions', 'remove_completed'), ('admit', 'add_request'),
+                              ('finish', 'finish_request')]:
+            setattr(self, name, profiler.wrap(phase, getattr(self, name)))
+        self.place_function = profiler.wrap('place', self.place_function, _count_placement)
+        self.events.get_next_event = profiler.wrap('ingest', self.events.get_next_event)
+        for pool in self.pools.values():
+            # find_first_available_resource goes through find_resource, so it is timed and counted once
+            pool.find_resource = profiler.wrap('find_resource', pool.find_resource, _count_lookup)
+            pool.find_available_resources = profiler.wrap('find_resource', pool.find_available_resources, _count_lookup)
+        return profiler
+
+    def disable_profiling(self) -> Optional[Profiler]:
+        """Put back the untimed methods, returning the profiler with what it collected."""
+        profiler = self.profiler
+        if profiler is None:
+            return None
+        for name in ['run', 'run_event_driven', 'schedule', 'remove_completed', 'add_request', 'finish_request',
+                     'place_function']:
+            del self.__dict__[name]
+        del self.events.__dict__['get_next_event']
+        for pool in self.pools.values():
+            del pool.__dict__['find_resource']
+            del pool.__dict__['find_available_resources']
+        self.profiler = None
+        return profiler
+
     def run(self, *args, **kwargs) -> int:
+        """Step the simulation 1ms at a time, calling `schedule` on every tick."""
         while self.events.has_more_events():
             (invocations, absolute_time, elapsed_time) = self.events.get_next_event()
             for _ in range(0, max(0, elapsed_time - 1)):
+                self.time += 1
                 self.schedule(self.time, set(), *args, **kwargs)
+            if elapsed_time > 0:
                 self.time += 1
             assert self.time == absolute_time, "The time should have been accurately stepped to current time"
             self.schedule(self.time, invocations, *args, **kwargs)
@@ -34,3 +146,40 @@ class System:
             self.schedule(self.time, set(), *args, **kwargs)
 
         return self.time
+
+    def run_event_driven(self, *args, **kwargs) -> int:
+        """
+        Jump straight from one interesting moment to the next instead of stepping 1ms at a time.
+        The next moment is the earlier of the next arrival and `next_wakeup_time`, so `schedule` is only
+        called when something can actually change. Gives the same result as `run` for schedulers that only
+        react to arrivals and completions.
+        """
+        pending = None
+        stepped = False
+        while pending is not None or self.events.has_more_events() or len(self.outstanding_requests) > 0:
+            if pending is None and self.events.has_more_events():
+                pending = self.events.get_next_event()
+            next_arrival = pending[1] if pending is not None else sys.maxsize
+            next_time = min(next_arrival, self.next_wakeup_time())
+            assert next_time != sys.maxsize, "Outstanding requests can never make progress: nothing is running or arriving"
+            if stepped:
+                # A function can finish in the same ms it started; the tick loop only sees it on the next tick
+                next_time = max(next_time, self.time + 1)
+            self.time = next_time
+            stepped = True
+            if next_time == next_arrival:
+                self.schedule(self.time, pending[0], *args, **kwargs)
+                pending = None
+            else:
+                self.schedule(self.time, set(), *args, **kwargs)
+
+        return self.time
+
+
+def _count_placement(profiler: Profiler, placed: bool):
+    profiler.count('decisions' if placed else 'rejected_placements')
+
+
+def _count_lookup(profiler: Profiler, found):
+    if not found:
+        profiler.count('failed_placements')
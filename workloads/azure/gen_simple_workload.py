@@ -1,13 +1,25 @@
-import pandas as pd
+import os
 
-from utils import read_function_invocations
+from simulator.event_queue import InvocationStreamQueue
+from workloads.azure.trace_events import Arrival, assign_templates, sample_functions, trace_events
+from workloads.azure.utils import open_invocation_cache
+from workloads.toy.linear_dag import linear_dag
 
-def gen_simple_workload(path_to_invocations, number_of_functions):
-    invocations = read_function_invocations(path_to_invocations, start=1, end=1440)
-    funcs = invocations.sample(n=number_of_functions)
-    for f in funcs.iterrows():
-        print(type(f))
+
+def gen_simple_workload(path_to_invocations, number_of_functions, cache_dir=None, templates=[(linear_dag, None)],
+                        arrival=Arrival.POISSON, seed=0):
+    """An event queue replaying the first day of number_of_functions sampled http functions as `templates`."""
+    cache_dir = cache_dir or os.path.join(path_to_invocations, 'cache')
+    (functions, counts) = open_invocation_cache(path_to_invocations, cache_dir).get_counts(['http'], start=1, end=1440)
+    rows = sample_functions(len(functions), number_of_functions, seed)
+    template_index = assign_templates(functions, len(templates))
+    return InvocationStreamQueue(trace_events(counts, templates, template_index, rows, arrival, seed))
 
 
 if __name__ == "__main__":
-    gen_simple_workload('./azurefunctions-dataset2019/', 10)
+    events = gen_simple_workload('./azurefunctions-dataset2019/', 10)
+    num_events = 0
+    while events.has_more_events():
+        events.get_next_event()
+        num_events += 1
+    print(f"Distinct invocation times: {num_events}")
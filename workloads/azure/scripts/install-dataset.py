@@ -2,33 +2,74 @@
 # -*- coding: utf-8 -*-
 
 """A script for downloading the AzureFunctionsDataset2019 into the current directory
+
+The tarball is streamed and extracted a member at a time, so it is never held in memory or written to disk.
+Each day's invocation CSV is handed to a worker process as soon as it is extracted, and the parsed days are
+merged into the columnar cache that utils.InvocationCache reads.
 """
 
+import argparse
 import os
-import pandas as pd
-import requests
-import tarfile 
+import re
+import sys
+import tarfile
+from multiprocessing import Pool
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from utils import STAGING_DIRNAME, describe_source, merge_staged_days, stage_day  # noqa: E402
 
 TAR_FILENAME = "azurefunctions-dataset2019.tar.xz"
 URL = f"https://azurecloudpublicdataset2.blob.core.windows.net/azurepublicdatasetv2/azurefunctions_dataset2019/{TAR_FILENAME}"
+DAY_PATTERN = re.compile(r'invocations_per_function_md\.anon\.d(\d+)\.csv$')
 
-tar_path = os.path.join(os.getcwd(), TAR_FILENAME)
-dir_name = TAR_FILENAME.split(".")[0]
-
-# Download file
-resp = requests.get(URL, allow_redirects=True, stream=True)
 
-with open(tar_path, 'wb') as tf:
-    tf.write(resp.content)
+def open_tarball(tarball):
+    """The dataset as a streaming tarfile, read from `tarball` if given, otherwise downloaded."""
+    if tarball is not None:
+        return tarfile.open(tarball, mode='r|xz')
+    import requests  # Only needed to download
+    resp = requests.get(URL, allow_redirects=True, stream=True)
+    resp.raise_for_status()
+    resp.raw.decode_content = True
+    return tarfile.open(fileobj=resp.raw, mode='r|xz')
 
-# Extract tar
-tar = tarfile.open(tar_path)
-tar.extractall(dir_name)
 
-# Delete tar
-os.remove(tar_path)
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--tarball', help="Path to an already downloaded tarball, to install offline")
+    parser.add_argument('--dest', default=os.path.join(os.getcwd(), TAR_FILENAME.split(".")[0]))
+    parser.add_argument('--cache-dir', help="Where to build the columnar cache, <dest>/cache by default")
+    parser.add_argument('--no-cache', action='store_true', help="Only extract the CSVs")
+    parser.add_argument('--processes', type=int, default=None, help="Worker processes, every core by default")
+    args = parser.parse_args()
 
+    dir_name = args.dest
+    cache_dir = args.cache_dir or os.path.join(dir_name, 'cache')
+    staging_dir = os.path.join(cache_dir, STAGING_DIRNAME)
+    os.makedirs(dir_name, exist_ok=True)
+    if not args.no_cache:
+        os.makedirs(staging_dir, exist_ok=True)
 
+    # Extract tar, parsing each day while the next members are extracted
+    with Pool(args.processes) as pool:
+        staged = []
+        paths = {}  # Day -> extracted CSV
+        with open_tarball(args.tarball) as tar:
+            for member in tar:
+                tar.extract(member, dir_name)
+                match = DAY_PATTERN.search(member.name)
+                if match and not args.no_cache:
+                    path = os.path.join(dir_name, member.name)
+                    day = int(match.group(1))
+                    paths[day] = path
+                    staged.append(pool.apply_async(stage_day, (path, staging_dir, day)))
+                    print(f"Extracted {member.name}")
+        days = sorted(result.get() for result in staged)
 
+    if days:
+        merge_staged_days(cache_dir, [describe_source(paths[day], day) for day in days])
+        print(f"Cached {len(days)} days of invocations in {cache_dir}")
 
 
+if __name__ == "__main__":
+    main()
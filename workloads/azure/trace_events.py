@@ -0,0 +1,74 @@
+"""Turning per-minute invocation counts of the AzureFunctions dataset into a stream of simulator invocations."""
+import zlib
+from enum import Enum
+
+import numpy as np
+
+MS_PER_MINUTE = 60000
+
+
+class Arrival(Enum):
+    UNIFORM = 1  # A minute's invocations evenly spaced over the minute
+    POISSON = 2  # A Poisson process with the minute's count as its rate, so the number of invocations varies too
+    JITTER = 3   # Evenly spaced, each moved by a random amount within its share of the minute
+
+
+def sample_functions(num_functions, n, seed=0):
+    """Rows of n distinct functions out of num_functions, in row order."""
+    rng = np.random.default_rng(seed)
+    return np.sort(rng.choice(num_functions, size=min(n, num_functions), replace=False))
+
+
+def assign_templates(functions, num_templates):
+    """
+    The index of the DAG template each function (a DataFrame row with a HashFunction) runs as.
+    Based only on the function's hash, so a function gets the same template whatever else is sampled.
+    """
+    return np.array([zlib.crc32(name.encode()) % num_templates for name in functions['HashFunction']], dtype=np.int64)
+
+
+def minute_offsets(per_minute, arrival, rng):
+    """
+    Millisecond offsets, within their minute, of every invocation of every (function, minute) in per_minute,
+    grouped in the same order as per_minute. Returns the offsets and how many invocations each entry got.
+    """
+    if arrival == Arrival.POISSON:
+        per_minute = rng.poisson(per_minute)
+    total = int(per_minute.sum())
+    if arrival == Arrival.POISSON:
+        return (rng.integers(0, MS_PER_MINUTE, size=total), per_minute)
+
+    counts = np.repeat(per_minute, per_minute)
+    first = np.cumsum(per_minute) - per_minute
+    k = np.arange(total) - np.repeat(first, per_minute)  # Which of its minute's invocations this is
+    if arrival == Arrival.UNIFORM:
+        return ((k * MS_PER_MINUTE) // counts, per_minute)
+    return (((k + rng.random(total)) * MS_PER_MINUTE / counts).astype(np.int64), per_minute)
+
+
+def trace_events(counts, templates, template_index, rows=None, arrival=Arrival.POISSON, seed=0,
+                 chunk_minutes=60, start_time=0):
+    """
+    Replay counts (functions x minutes, e.g. from InvocationCache.get_counts) as (time, DAG, input) sorted by time.
+    - templates: a list of (dag, input), and template_index[row] is the one that row of counts runs as
+    - rows: the rows of counts to replay, every row if None
+    - start_time: the time in milliseconds of the start of the first minute
+
+    Reads chunk_minutes minutes at a time, so memory depends on the chunk size rather than the length of the trace.
+    The same seed and chunk_minutes always give the same stream.
+    """
+    rows = np.arange(counts.shape[0]) if rows is None else np.asarray(rows)
+    template_index = np.asarray(template_index)
+    for chunk_start in range(0, counts.shape[1], chunk_minutes):
+        rng = np.random.default_rng([seed, chunk_start])
+        chunk = np.asarray(counts[rows, chunk_start:chunk_start + chunk_minutes], dtype=np.int64)
+        (nonzero_rows, minutes) = np.nonzero(chunk)
+        if len(nonzero_rows) == 0:
+            continue
+        (offsets, per_minute) = minute_offsets(chunk[nonzero_rows, minutes], arrival, rng)
+        times = start_time + (chunk_start + np.repeat(minutes, per_minute)) * MS_PER_MINUTE + offsets
+        invocation_rows = rows[np.repeat(nonzero_rows, per_minute)]
+        order = np.lexsort((invocation_rows, times))
+        for time, t in zip(times[order].tolist(), template_index[invocation_rows[order]].tolist()):
+            (dag, input) = templates[t]
+            yield (time, dag, input)
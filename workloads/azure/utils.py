@@ -1,20 +1,44 @@
 """Utilities for reading and processing the AzureFunctions dataset."""
+import json
 import os
+import shutil
+import warnings
+from multiprocessing import Pool
 
+import numpy as np
 import pandas as pd
 
+KEY_COLUMNS = ['HashOwner', 'HashApp', 'HashFunction', 'Trigger']
+MINUTES_PER_DAY = 1440
+NUM_DAYS = 14
+
+# Files of a columnar invocation cache, see build_invocation_cache
+COUNTS_FILENAME = 'counts.npy'
+FUNCTIONS_FILENAME = 'functions.csv'
+INDEX_FILENAME = 'index.json'
+STAGING_DIRNAME = 'staging'  # Each day's parsed counts, before they are merged
+
+
+def invocations_path(path_to_dir, day):
+    return os.path.join(path_to_dir, f'invocations_per_function_md.anon.d{day:02d}.csv')
+
+
+def read_function_invocations(path_to_dir, triggers=['http'], start=1, end=20160, cache_dir=None):
+    """
+    Per-minute invocations of the functions with one of `triggers`, as one row per function.
+    With a cache_dir, the counts come from a columnar cache (built there first if it isn't yet), only minutes
+    start to end are returned, and functions missing on some days are kept with zero invocations on those days.
+    """
+    if cache_dir is not None:
+        return open_invocation_cache(path_to_dir, cache_dir).to_frame(triggers, start, end)
 
-def read_function_invocations(path_to_dir, triggers=['http'], start=1, end=20160):
     start_file_index = (start - 1) // 1440 + 1
     end_file_index = (end - 1) // 1440 + 1
 
     files = []
     for i in range(start_file_index, end_file_index + 1):
         print(i)
-        if i > 9:
-            files.append((i, os.path.join(path_to_dir, f'invocations_per_function_md.anon.d{i}.csv')))
-        else:
-            files.append((i, os.path.join(path_to_dir, f'invocations_per_function_md.anon.d0{i}.csv')))
+        files.append((i, invocations_path(path_to_dir, i)))
 
     all_invocations = None
     for i, (ind, f) in enumerate(files):
@@ -30,5 +54,183 @@ def read_function_invocations(path_to_dir, triggers=['http'], start=1, end=20160
     return all_invocations
 
 
+def read_day_counts(path):
+    """One day's per-minute counts, summed per function, indexed by KEY_COLUMNS."""
+    dtypes = {column: str for column in KEY_COLUMNS}
+    dtypes.update({f'{min}': np.uint32 for min in range(1, MINUTES_PER_DAY + 1)})
+    invocs = pd.read_csv(path, engine='c', dtype=dtypes)
+    return invocs.groupby(KEY_COLUMNS, sort=False).sum()
+
+
+def order_functions(keys):
+    """Every distinct function in `keys`, sorted so each trigger's functions are consecutive rows."""
+    return keys.drop_duplicates().sort_values(['Trigger', 'HashOwner', 'HashApp', 'HashFunction'], ignore_index=True)
+
+
+def describe_source(path, day):
+    """What a cache records about the file a day was read from, to tell when the file has changed."""
+    stat = os.stat(path)
+    return {'day': day, 'name': os.path.basename(path), 'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+
+
+def source_files(path_to_dir, days=range(1, NUM_DAYS + 1)):
+    return [describe_source(invocations_path(path_to_dir, day), day) for day in days
+            if os.path.exists(invocations_path(path_to_dir, day))]
+
+
+def cache_matches(path_to_dir, cache_dir, days=range(1, NUM_DAYS + 1)):
+    """
+    Whether cache_dir holds a complete cache that agrees with every file for `days` still in path_to_dir.
+    Files that were deleted after the cache was built don't count against it, so the CSVs can be removed once
+    they are converted; a file that is there but changed, or wasn't part of the cache, does.
+    """
+    index_path = os.path.join(cache_dir, INDEX_FILENAME)
+    if not os.path.exists(index_path):
+        return False
+    with open(index_path) as f:
+        index = json.load(f)
+    recorded = {source['day']: source for source in index.get('sources', [])}
+    return all(recorded.get(source['day']) == source for source in source_files(path_to_dir, days))
+
+
+def open_invocation_cache(path_to_dir, cache_dir, days=range(1, NUM_DAYS + 1), processes=None):
+    """
+    The InvocationCache in cache_dir, first building it from path_to_dir if it isn't there yet, or rebuilding it
+    if some file in path_to_dir differs from what it was built from (another directory, or a file changed since).
+    A cache whose files have all been deleted is used as it is.
+    """
+    if not cache_matches(path_to_dir, cache_dir, days):
+        if os.path.exists(os.path.join(cache_dir, INDEX_FILENAME)):
+            warnings.warn(f"The invocation cache in {cache_dir} was not built from {path_to_dir}, rebuilding it.")
+        build_invocation_cache(path_to_dir, cache_dir, days, processes)
+    return InvocationCache(cache_dir)
+
+
+def staged_paths(staging_dir, day):
+    return (os.path.join(staging_dir, f'd{day:02d}.keys.csv'), os.path.join(staging_dir, f'd{day:02d}.counts.npy'))
+
+
+def stage_day(path, staging_dir, day):
+    """Parse one day's CSV and save its functions and counts in staging_dir, for merge_staged_days. Returns day."""
+    day_counts = read_day_counts(path)
+    (keys_path, counts_path) = staged_paths(staging_dir, day)
+    day_counts.index.to_frame(index=False).to_csv(keys_path, index=False)
+    np.save(counts_path, day_counts.to_numpy(dtype=np.uint32))
+    return day
+
+
+def build_invocation_cache(path_to_dir, cache_dir, days=range(1, NUM_DAYS + 1), processes=None):
+    """
+    Convert the daily CSVs into a columnar cache in cache_dir:
+    - counts.npy, a functions x minutes uint32 array that InvocationCache memory-maps
+    - functions.csv, the KEY_COLUMNS of each row of counts.npy, grouped by trigger
+    - index.json, the rows of each trigger, the number of minutes and the source files, written last so a
+      partial cache is never used
+    Each day is parsed in its own worker process (of `processes`, every core if None). Days whose file is missing
+    are left as zeros.
+    """
+    sources = source_files(path_to_dir, days)
+    if not sources:
+        raise FileNotFoundError(f"No invocation files in {path_to_dir} to build a cache from.")
+    days = [source['day'] for source in sources]
+    staging_dir = os.path.join(cache_dir, STAGING_DIRNAME)
+    os.makedirs(staging_dir, exist_ok=True)
+    jobs = [(invocations_path(path_to_dir, day), staging_dir, day) for day in days]
+    if processes == 1:
+        for job in jobs:
+            stage_day(*job)
+    else:
+        with Pool(processes) as pool:
+            pool.starmap(stage_day, jobs)
+    merge_staged_days(cache_dir, sources)
+
+
+def merge_staged_days(cache_dir, sources):
+    """
+    Build the cache in cache_dir out of the days stage_day saved in its staging directory, then remove them.
+    sources holds describe_source of each day's file, in order of day.
+    """
+    index_path = os.path.join(cache_dir, INDEX_FILENAME)
+    if os.path.exists(index_path):
+        os.remove(index_path)  # Any previous cache stops being valid as soon as its counts are overwritten
+    days = [source['day'] for source in sources]
+    staging_dir = os.path.join(cache_dir, STAGING_DIRNAME)
+    keys = [pd.read_csv(staged_paths(staging_dir, day)[0], dtype=str) for day in days]
+    functions = order_functions(pd.concat(keys))
+    function_index = pd.MultiIndex.from_frame(functions)
+    num_minutes = max(days) * MINUTES_PER_DAY
+
+    counts_path = os.path.join(cache_dir, COUNTS_FILENAME)
+    counts = np.lib.format.open_memmap(f'{counts_path}.tmp', mode='w+', dtype=np.uint32, shape=(len(functions), num_minutes))
+    for day, day_keys in zip(days, keys):
+        rows = function_index.get_indexer(pd.MultiIndex.from_frame(day_keys))
+        first = (day - 1) * MINUTES_PER_DAY
+        counts[rows, first:first + MINUTES_PER_DAY] = np.load(staged_paths(staging_dir, day)[1], mmap_mode='r')
+    finish_invocation_cache(cache_dir, counts, functions, sources)
+    shutil.rmtree(staging_dir)
+
+
+def finish_invocation_cache(cache_dir, counts, functions, sources):
+    counts_path = os.path.join(cache_dir, COUNTS_FILENAME)
+    counts.flush()
+    del counts
+    os.replace(f'{counts_path}.tmp', counts_path)
+    functions.to_csv(os.path.join(cache_dir, FUNCTIONS_FILENAME), index=False)
+
+    trigger_rows = {}
+    for row, trigger in enumerate(functions['Trigger']):
+        rows = trigger_rows.setdefault(trigger, [row, row])
+        rows[1] = row + 1
+    days = [source['day'] for source in sources]
+    index = {'minutes': max(days) * MINUTES_PER_DAY, 'days': days, 'triggers': trigger_rows, 'sources': sources}
+    index_path = os.path.join(cache_dir, INDEX_FILENAME)
+    with open(f'{index_path}.tmp', 'w') as f:
+        json.dump(index, f)
+    os.replace(f'{index_path}.tmp', index_path)
+
+
+class InvocationCache:
+    """Per-minute invocations of every function, memory-mapped from a cache made by build_invocation_cache."""
+
+    def __init__(self, cache_dir):
+        with open(os.path.join(cache_dir, INDEX_FILENAME)) as f:
+            index = json.load(f)
+        self.num_minutes = index['minutes']
+        self.days = index['days']
+        self.trigger_rows = {trigger: tuple(rows) for trigger, rows in index['triggers'].items()}
+        self.counts = np.load(os.path.join(cache_dir, COUNTS_FILENAME), mmap_mode='r')
+        self.functions = pd.read_csv(os.path.join(cache_dir, FUNCTIONS_FILENAME), dtype=str)
+
+    def rows(self, triggers=['http']):
+        """
+        The rows of the functions with one of `triggers`: a slice if they are consecutive, which is always
+        the case for a single trigger, otherwise an array of row numbers.
+        """
+        ranges = sorted(self.trigger_rows[trigger] for trigger in set(triggers) if trigger in self.trigger_rows)
+        merged = []
+        for first, last in ranges:
+            if merged and merged[-1][1] == first:
+                merged[-1][1] = last
+            else:
+                merged.append([first, last])
+        if len(merged) == 0:
+            return slice(0, 0)
+        if len(merged) == 1:
+            return slice(*merged[0])
+        return np.concatenate([np.arange(first, last) for first, last in merged])
 
+    def get_counts(self, triggers=['http'], start=1, end=None):
+        """
+        Invocations per minute, minutes start to end inclusive, of the functions with one of `triggers`,
+        as (functions, counts). counts is a view of the memory-mapped cache whenever rows() is a slice.
+        """
+        end = self.num_minutes if end is None else min(end, self.num_minutes)
+        rows = self.rows(triggers)
+        return (self.functions.iloc[rows].reset_index(drop=True), self.counts[rows, start - 1:end])
 
+    def to_frame(self, triggers=['http'], start=1, end=None):
+        """get_counts as one DataFrame, with read_function_invocations' columns."""
+        end = self.num_minutes if end is None else min(end, self.num_minutes)
+        (functions, counts) = self.get_counts(triggers, start, end)
+        minutes = pd.DataFrame(np.asarray(counts), columns=[f'{min}' for min in range(start, end + 1)])
+        return pd.concat([functions, minutes], axis=1)
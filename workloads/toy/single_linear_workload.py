@@ -1,5 +1,7 @@
 
 
+from itertools import count
+
 from simulator.event_queue import EventQueue
 from simulator.resource import *
 from simulator.dag import Dag
@@ -12,45 +14,41 @@ class SimpleSystem(System):
 
 	def __init__(self,_events: EventQueue, _pools: Dict[str, ResourcePool]):
 		super().__init__(_events, _pools)
+		self.__arrivals = count()
 
 	def schedule(self, curr_time, events, *args, **kwargs):
 		# First check for any completed functions
-		for name, pool in self.pools.items():
-			for resource in pool.get_all_resources():
-				completed = resource.remove_at_time(curr_time)
-				for (fid, tag) in completed:
-					assert tag in self.outstanding_requests, "Tag needs to map to an outstanding request"
-					self.outstanding_requests[tag] = (True, self.outstanding_requests[tag][1])
+		for (resource, fid, tag) in self.remove_completed(curr_time):
+			assert tag in self.outstanding_requests, "Tag needs to map to an outstanding request"
+			self.outstanding_requests[tag].complete_function(fid)
 		# Now process any new events
 		for (dag, input) in events:
 			dag.execute()  # Need to do this to seal the DAG
-			self.outstanding_requests[self.__generate_tag(dag, curr_time)] = (True, dag)
-		# Now schedule functions
-		for tag, (flag, dag) in self.outstanding_requests.copy().items():
-			if flag:
-				if dag.has_next_function():
-					# Find which resource is faster
-					nxt = dag.peek_next_function()
-					std_cpu = nxt.resources['STD_CPU']
-					std_gpu = nxt.resources['STD_GPU']
-					cpu_time = std_cpu['pre'].get_runtime() + std_cpu['exec'].get_runtime() + std_cpu['post'].get_runtime()
-					gpu_time = std_gpu['pre'].get_runtime() + std_gpu['exec'].get_runtime() + std_gpu['post'].get_runtime()
-					if cpu_time < gpu_time:
-						pool = self.pools['STD_CPU_POOL']
-					else:
-						pool = self.pools['STD_GPU_POOL']
-					# If there is a resource available, schedule it
-					result : Optional[Tuple[str, Resource]] = pool.find_first_available_resource(nxt, tag)
-					if result:
-						(name, rsrc) = result
-						rsrc.add_function(dag.next_function(), tag, curr_time)
-						self.outstanding_requests[tag] = (False, self.outstanding_requests[tag][1])
+			self.add_request(self.__generate_tag(dag, curr_time), dag, curr_time)
+		# Now schedule every function that is ready to run
+		for tag, dag in self.outstanding_requests.copy().items():
+			if dag.is_finished():
+				self.finish_request(tag, curr_time)
+				continue
+			for nxt in dag.ready_functions():
+				# Find which resource is faster
+				std_cpu = nxt.resources['STD_CPU']
+				std_gpu = nxt.resources['STD_GPU']
+				cpu_time = sum(std_cpu[phase].expected_runtime(dag.input) for phase in ('pre', 'exec', 'post'))
+				gpu_time = sum(std_gpu[phase].expected_runtime(dag.input) for phase in ('pre', 'exec', 'post'))
+				if cpu_time < gpu_time:
+					pool = self.pools['STD_CPU_POOL']
 				else:
-					# Remove if there is no next function
-					self.outstanding_requests.pop(tag)
+					pool = self.pools['STD_GPU_POOL']
+				# If there is a resource available, schedule it
+				result : Optional[Tuple[str, Resource]] = pool.find_first_available_resource(nxt, tag)
+				if result:
+					(name, rsrc) = result
+					self.place_function(rsrc, nxt, tag, curr_time, dag.input)
 
 	def __generate_tag(self, dag: Dag, time: int):
-		return f"{dag.name}:{time}"
+		# The counter keeps tags unique when the same DAG is invoked more than once in the same ms
+		return f"{dag.name}:{time}:{next(self.__arrivals)}"
 
 	def __decode_tag(self, tag: str) -> Dag:
 		return self.outstanding_requests[tag]